@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -111,6 +112,46 @@ DATABASES = {
     }
 }
 
+# Perfil do banco: 'basic' (padrão) mantém a configuração padrão do Django; 'production' liga WAL,
+# PRAGMAs, conexões persistentes, uma conexão separada só para leituras e o cache em arquivo
+# compartilhado pelos workers. Os servidores de produção definem CHAESO_DATABASE_PROFILE=production
+DATABASE_PROFILE = os.environ.get('CHAESO_DATABASE_PROFILE', 'basic')
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # espera (segundos) por um lock de escrita antes de falhar
+        'OPTIONS': {'timeout': 5},
+    })
+    # mesmo arquivo, com PRAGMA query_only; com WAL, leitores não esperam os escritores
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'READ_ONLY': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['core.routers.ReadReplicaRouter']
+
+    # aplicados a cada conexão por core.db
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    }
+
+    # cache compartilhado pelos workers do servidor (core.cache), usado também pelos limites de requisições;
+    # no perfil 'basic' fica o cache em memória padrão do Django, separado por processo
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': BASE_DIR / 'cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -151,6 +192,15 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Entrega dos arquivos de mídia (core.media.serve)
+# 'python' envia o arquivo pelo Django (com suporte a Range e os.sendfile via wsgi.file_wrapper),
+# 'x-accel-redirect' delega ao nginx, 'x-sendfile' ao apache/lighttpd e 'none' desativa a rota
+MEDIA_SERVE_BACKEND = 'python'
+# location "internal" do nginx que aponta para MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# validade do cache para arquivos sem hash no nome; os demais são imutáveis
+MEDIA_CACHE_MAX_AGE = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -168,21 +218,95 @@ DJOSER = {
 # DRF
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedBasicAuthentication',
+        'core.authentication.CachedTokenAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # contadores no cache compartilhado (CACHES abaixo): o limite vale para todos os workers
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.throttling.AnonSlidingWindowThrottle',
+        'core.throttling.UserSlidingWindowThrottle',
     ),
+    # ex.: '100/min'; sem valor, não há limite
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.environ.get('CHAESO_THROTTLE_ANON_RATE'),
+        'user': os.environ.get('CHAESO_THROTTLE_USER_RATE'),
+    },
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Desempenho (core.middleware.PerformanceMiddleware)
+# envia o header Server-Timing com as fases de cada requisição
+PERFORMANCE_SERVER_TIMING = True
+# fração das requisições guardadas no ring buffer de /api/v1/performance/; as lentas são sempre guardadas
+PERFORMANCE_SAMPLE_RATE = 0.1
+PERFORMANCE_SLOW_MS = 500
+PERFORMANCE_BUFFER_SIZE = 5000
+# ações que passam de query_budgets: 'warn' (log), 'raise' (QueryBudgetExceeded) ou 'off'
+QUERY_BUDGET_MODE = 'warn'
+
+# Paginação
+# limite máximo para o parâmetro ?page_size= das listagens
+PAGINATION_MAX_PAGE_SIZE = 500
+
+# Autenticação
+# validade (segundos) das credenciais e tokens já verificados (os tokens ficam no cache 'default')
+# e tamanho máximo do cache de credenciais Basic, por processo
+AUTH_CACHE_TTL = 60
+AUTH_CACHE_MAX_ENTRIES = 10000
+
+# Importação de usuários (core.imports: comando import_users e POST /api/v1/customuser/import/)
+# usuários por transação, processos para o hash das senhas no comando (None: número de CPUs) e
+# na API (1: sem pool, o hash roda no worker da requisição), e pasta dos arquivos recebidos pela
+# API e dos checkpoints
+USER_IMPORT_CHUNK_SIZE = 500
+USER_IMPORT_WORKERS = None
+USER_IMPORT_API_WORKERS = 1
+USER_IMPORT_DIR = BASE_DIR / 'imports'
+
+# Pedidos
+# quantidade máxima de pedidos aceita por POST /api/v1/order/bulk/
+ORDER_BULK_MAX_ITEMS = 5000
+# feed SSE em /api/v1/order/events/: intervalo (segundos) entre keepalives e releituras do histórico
+ORDER_EVENTS_HEARTBEAT_SECONDS = 15
+# eventos guardados por conexão antes de recorrer ao histórico
+ORDER_EVENTS_QUEUE_SIZE = 1000
+# dias de histórico de eventos mantidos pelo comando purge_order_events
+ORDER_EVENTS_RETENTION_DAYS = 30
+# rota de entrega (/api/v1/order/route/): CEP de saída dos transportadores (None: começa pelo menor CEP),
+# tempo máximo (segundos) da otimização 2-opt e arquivo com os centroides das regiões de CEP
+ORDER_ROUTE_START_CEP = None
+ORDER_ROUTE_OPTIMIZE_SECONDS = 0.5
+ORDER_ROUTE_CEP_CENTROIDS = BASE_DIR / 'core' / 'data' / 'cep_centroids.csv'
+
+# Produtos
+# validade (segundos) da versão e das respostas do catálogo em cache
+PRODUCT_CATALOG_CACHE_TIMEOUT = 60
+# variantes das fotos (maior lado em pixels), geradas em WebP e JPEG fora da requisição
+PRODUCT_IMAGE_VARIANTS = {
+    'thumbnail': 200,
+    'medium': 600,
+    'full': 1600,
 }
+PRODUCT_IMAGE_WORKERS = 2
+PRODUCT_IMAGE_ASYNC = True
 
 AUTH_USER_MODEL = 'core.CustomUser'
 
+# Simple JWT
+SIMPLE_JWT = {
+    'AUTH_HEADER_TYPES': ('Bearer', 'JWT'),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.ChaesoTokenObtainPairSerializer',
+    'TOKEN_USER_CLASS': 'core.authentication.ChaesoTokenUser',
+}
+# intervalo (segundos) para recarregar a blacklist de tokens usada pela ClaimsJWTAuthentication
+JWT_BLACKLIST_REFRESH_SECONDS = 30
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Chaeso API',
     'DESCRIPTION': 'API com os endpoints e documentação de projeto acadêmico',
@@ -0,0 +1,245 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from core import performance
+from core.roles import Role
+
+
+# cache em memória com validade e limite de entradas (descarta as menos usadas)
+class BoundedTTLCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _new_cache():
+    return BoundedTTLCache(
+        max_entries=getattr(settings, 'AUTH_CACHE_MAX_ENTRIES', 10000),
+        ttl=getattr(settings, 'AUTH_CACHE_TTL', 60),
+    )
+
+
+# credenciais Basic já verificadas: digest -> (id do usuário, hash da senha no momento da verificação);
+# por processo, já que cada uso confere o usuário no banco
+verified_credentials = _new_cache()
+
+_digest_key = None
+
+
+# hash rápido com chave derivada da SECRET_KEY; nem senhas nem tokens ficam guardados em memória
+def credential_digest(*parts):
+    global _digest_key
+    if _digest_key is None:
+        _digest_key = hashlib.sha256(f'chaeso.auth-cache:{settings.SECRET_KEY}'.encode()).digest()
+    return hashlib.blake2b('\0'.join(parts).encode(), key=_digest_key, digest_size=32).digest()
+
+
+# tokens já verificados ficam no cache compartilhado pelos workers (core.cache.SQLiteCache no perfil
+# de produção): a revogação feita em um worker vale para todos
+def token_cache_key(key):
+    return f"auth-token:{credential_digest('token', key).hex()}"
+
+
+def invalidate_user(user_id):
+    verified_credentials.delete_where(lambda entry: entry[0] == user_id)
+    cache.delete_many([token_cache_key(key) for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True)])
+
+
+def invalidate_token(key):
+    cache.delete(token_cache_key(key))
+
+
+# cronometra a autenticação como uma fase da requisição (Server-Timing)
+class TimedAuthenticationMixin:
+    def authenticate(self, request):
+        with performance.phase('auth'):
+            return super().authenticate(request)
+
+
+# evita repetir o PBKDF2 a cada requisição com as mesmas credenciais Basic
+class CachedBasicAuthentication(TimedAuthenticationMixin, BasicAuthentication):
+    def authenticate_credentials(self, userid, password, request=None):
+        digest = credential_digest('basic', userid, password)
+        entry = verified_credentials.get(digest)
+        if entry is not None:
+            user_id, password_hash = entry
+            user = get_user_model()._default_manager.filter(pk=user_id).first()
+            # o hash guardado no banco confirma que a senha não mudou (inclusive em outros processos)
+            if user is not None and user.is_active and user.password == password_hash:
+                return (user, None)
+            verified_credentials.delete(digest)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        verified_credentials.set(digest, (user.pk, user.password))
+        return (user, auth)
+
+
+# evita a consulta de token + usuário a cada requisição
+class CachedTokenAuthentication(TimedAuthenticationMixin, TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        # cada get devolve uma cópia nova, sem o que for anexado ao usuário durante a requisição
+        entry = cache.get(cache_key)
+        if entry is None:
+            entry = super().authenticate_credentials(key)
+            cache.set(cache_key, entry, getattr(settings, 'AUTH_CACHE_TTL', 60))
+        return entry
+
+
+# jtis de tokens na blacklist, recarregados do banco em lotes a cada JWT_BLACKLIST_REFRESH_SECONDS
+class RevokedTokenCache:
+    batch_size = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expires = {}
+        self._last_id = 0
+        self._refreshed_at = None
+
+    def is_revoked(self, *jtis):
+        self._refresh_if_stale()
+        return any(jti in self._expires for jti in jtis if jti)
+
+    def clear(self):
+        with self._lock:
+            self._expires = {}
+            self._last_id = 0
+            self._refreshed_at = None
+
+    def _refresh_if_stale(self):
+        interval = getattr(settings, 'JWT_BLACKLIST_REFRESH_SECONDS', 30)
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < interval:
+            return
+
+        with self._lock:
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < interval:
+                return
+            # busca apenas as entradas novas desde a última leitura
+            while True:
+                rows = list(
+                    BlacklistedToken.objects
+                    .filter(id__gt=self._last_id)
+                    .order_by('id')
+                    .values_list('id', 'token__jti', 'token__expires_at')[:self.batch_size]
+                )
+                for row_id, jti, expires_at in rows:
+                    self._expires[jti] = expires_at
+                    self._last_id = row_id
+                if len(rows) < self.batch_size:
+                    break
+
+            # tokens já expirados são recusados pela validação normal
+            now = timezone.now()
+            self._expires = {jti: expires for jti, expires in self._expires.items() if expires > now}
+            self._refreshed_at = time.monotonic()
+
+
+revoked_tokens = RevokedTokenCache()
+
+
+# usuário montado a partir das claims do JWT; só consulta o banco se algo fora das claims for usado.
+# É apenas para leitura: requisições de escrita recebem o CustomUser (ClaimsJWTAuthentication)
+class ChaesoTokenUser(TokenUser):
+    def __init__(self, token):
+        super().__init__(token)
+        role = Role(token.get('client_id'), token.get('transporter_id'))
+        # tokens sem papel podem ser anteriores ao cadastro do cliente/transportador: resolve no banco
+        if role.client_id is not None or role.transporter_id is not None:
+            self._chaeso_role = role
+
+    @cached_property
+    def db_user(self):
+        return get_user_model()._default_manager.get(pk=self.pk)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.db_user, attr)
+
+    def save(self, *args, **kwargs):
+        return self.db_user.save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.db_user.delete(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        return self.db_user.set_password(raw_password)
+
+    def check_password(self, raw_password):
+        return self.db_user.check_password(raw_password)
+
+
+# JWT sem consulta ao banco nas leituras: usuário e papel vêm das claims assinadas. Nas escritas o
+# usuário é o CustomUser do banco, porque serializers alteram request.user e chamam save()
+class ClaimsJWTAuthentication(TimedAuthenticationMixin, JWTStatelessUserAuthentication):
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None or request.method in SAFE_METHODS:
+            return result
+
+        token_user, token = result
+        with performance.phase('auth'):
+            user = get_user_model()._default_manager.filter(pk=token_user.pk).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed("Usuário inativo ou inexistente.", code='user_inactive')
+        role = getattr(token_user, '_chaeso_role', None)
+        if role is not None:
+            user._chaeso_role = role
+        return (user, token)
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        # rjti é o jti do refresh token que originou o access token
+        if revoked_tokens.is_revoked(token.get('jti'), token.get('rjti')):
+            raise InvalidToken("Token revogado.")
+        return token
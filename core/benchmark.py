@@ -0,0 +1,309 @@
+import json
+import math
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.test import Client as DjangoTestClient
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from core import models
+from core.dataset import Generator
+
+API_PREFIX = '/api/v1/'
+BASE_URL_VARIABLE = '{{ _.baseurl }}'
+PASSWORD = 'benchmark-12345'
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+# peso de cada cenário no sorteio das requisições
+DEFAULT_WEIGHTS = {
+    'register': 1,
+    'login': 2,
+    'product_list': 10,
+    'order_create': 3,
+    'order_list': 8,
+    'transporter_statistics': 2,
+}
+
+# requisição da coleção do Insomnia usada como modelo de cada cenário
+COLLECTION_REQUESTS = {
+    'register': 'POST User',
+    'login': 'POST Token',
+    'product_list': 'GET Product',
+    'order_create': 'POST Order',
+    'order_list': 'GET Order',
+}
+
+# cenários que não estão na coleção
+EXTRA_REQUESTS = {
+    'transporter_statistics': {'method': 'GET', 'path': 'transporter-statistics/', 'body': None, 'authenticated': True},
+}
+
+
+# lê as requisições da coleção exportada do Insomnia: {nome: {method, path, body}}
+def load_collection(path):
+    with open(path, encoding='utf-8') as file:
+        resources = json.load(file)['resources']
+
+    requests = {}
+    for resource in resources:
+        if resource.get('_type') != 'request':
+            continue
+        text = (resource.get('body') or {}).get('text') or ''
+        try:
+            body = json.loads(text) if text.strip() else None
+        except ValueError:
+            body = None
+        requests[resource['name']] = {
+            'method': resource['method'],
+            'path': resource['url'].replace(BASE_URL_VARIABLE, '').lstrip('/'),
+            'body': body,
+            # as requisições autenticadas da coleção levam um header Authorization ativo
+            'authenticated': any(
+                header.get('name', '').lower() == 'authorization' and not header.get('disabled')
+                for header in resource.get('headers') or ()
+            ),
+        }
+    return requests
+
+
+def build_templates(collection):
+    templates = dict(EXTRA_REQUESTS)
+    for scenario, name in COLLECTION_REQUESTS.items():
+        if name not in collection:
+            raise ValueError(f'A requisição "{name}" não está na coleção.')
+        templates[scenario] = collection[name]
+    return templates
+
+
+# banco de testes temporário, em arquivo (e não em memória) para medir o mesmo SQLite de produção
+@contextmanager
+def test_databases():
+    with tempfile.TemporaryDirectory() as directory:
+        for alias in connections:
+            settings_dict = connections[alias].settings_dict
+            if settings_dict['ENGINE'].endswith('sqlite3'):
+                test_settings = settings_dict.setdefault('TEST', {})
+                if not test_settings.get('NAME') and not test_settings.get('MIRROR'):
+                    test_settings['NAME'] = str(Path(directory) / f'test-{alias}.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections))
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+
+@dataclass
+class Dataset:
+    tag: str
+    clients: list = field(default_factory=list)
+    transporters: list = field(default_factory=list)
+    product_ids: list = field(default_factory=list)
+
+
+# carga pequena do gerador de core/dataset.py, com CPFs marcados pela tag (o mesmo banco pode
+# receber várias), entregas no último ano e um token por usuário
+def seed(clients=50, transporters=10, products=100, orders_per_client=20, random_seed=0):
+    tag = uuid.uuid4().hex[:4]
+    generator = Generator(
+        clients=clients, transporters=transporters, products=products, orders=clients * orders_per_client,
+        max_items=4, years=1, seed=random_seed, until=timezone.localdate(), password=PASSWORD, prefix=tag,
+    )
+    result = generator.run()
+
+    first_user = result.first_ids['customuser']
+    users = list(models.CustomUser.objects.filter(id__gte=first_user, id__lt=first_user + clients + transporters).order_by('id').values_list('id', 'cpf'))
+    tokens = Token.objects.bulk_create([Token(user_id=user_id, key=Token.generate_key()) for user_id, _ in users])
+    accounts = [(cpf, token.key) for (_, cpf), token in zip(users, tokens)]
+    first_product = result.first_ids['product']
+    return Dataset(
+        tag=tag,
+        clients=accounts[:clients],
+        transporters=accounts[clients:],
+        product_ids=list(range(first_product, first_product + products)),
+    )
+
+
+# monta a requisição de um cenário a partir do modelo da coleção e dos dados gerados
+class RequestFactory:
+    def __init__(self, templates, dataset):
+        self.templates = templates
+        self.dataset = dataset
+        self._registered = 0
+        self._lock = threading.Lock()
+
+    def build(self, scenario, rng):
+        template = self.templates[scenario]
+        body = dict(template['body']) if isinstance(template['body'], dict) else None
+
+        if scenario == 'register':
+            with self._lock:
+                self._registered += 1
+                number = self._registered
+            body.update(cpf=f'r{self.dataset.tag}{number:06d}', password=PASSWORD)
+        elif scenario == 'login':
+            body.update(cpf=rng.choice(self.dataset.clients)[0], password=PASSWORD)
+        elif scenario == 'order_create':
+            # cliente e transportador são definidos pelo servidor; o total é recalculado
+            body = {'products': rng.sample(self.dataset.product_ids, rng.randint(1, min(4, len(self.dataset.product_ids))))}
+
+        token = None
+        if template['authenticated']:
+            users = self.dataset.transporters if scenario == 'transporter_statistics' else self.dataset.clients
+            token = rng.choice(users)[1]
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        return template['method'], template['path'], body, headers
+
+
+# executa as requisições dentro do processo, com o cliente de testes do Django; conta as consultas
+class InProcessTransport:
+    def __init__(self):
+        self._local = threading.local()
+
+    def send(self, method, path, body, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = DjangoTestClient()
+        contexts = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        for context in contexts:
+            context.__enter__()
+        start = time.perf_counter()
+        try:
+            response = client.generic(
+                method, API_PREFIX + path,
+                data=json.dumps(body) if body is not None else '',
+                content_type='application/json',
+                headers=headers,
+            )
+        finally:
+            elapsed = time.perf_counter() - start
+            for context in contexts:
+                context.__exit__(None, None, None)
+        return response.status_code, elapsed, sum(len(context) for context in contexts)
+
+    def close(self):
+        connections.close_all()
+
+
+# executa as requisições contra um servidor em execução
+class HttpTransport:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.timeout = timeout
+
+    def send(self, method, path, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json', **headers},
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status, server_timing = response.status, response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status, server_timing = exc.code, exc.headers.get('Server-Timing')
+        except (urllib.error.URLError, OSError):
+            status, server_timing = 0, None
+        return status, time.perf_counter() - start, self._queries(server_timing)
+
+    # consultas informadas pelo PerformanceMiddleware no header Server-Timing
+    def _queries(self, server_timing):
+        if not server_timing:
+            return None
+        match = SERVER_TIMING_QUERIES.search(server_timing)
+        return int(match.group(1)) if match else 0
+
+    def close(self):
+        connections.close_all()
+
+
+def run(transport, factory, weights, total_requests, concurrency, warmup=0, random_seed=0):
+    scenarios = [name for name, weight in weights.items() if weight > 0]
+    scenario_weights = [weights[name] for name in scenarios]
+    samples = []
+    lock = threading.Lock()
+    remaining = [warmup + total_requests]
+
+    def worker(worker_id):
+        rng = random.Random(f'{random_seed}-{worker_id}')
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                    measured = remaining[0] < total_requests
+                scenario = rng.choices(scenarios, scenario_weights)[0]
+                status, elapsed, queries = transport.send(*factory.build(scenario, rng))
+                if measured:
+                    with lock:
+                        samples.append((scenario, status, elapsed, queries))
+        finally:
+            transport.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark') as executor:
+        for future in [executor.submit(worker, index) for index in range(concurrency)]:
+            future.result()
+    return samples, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # posição pelo método nearest-rank
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def summarize(samples, duration):
+    def stats(rows):
+        latencies = [elapsed * 1000 for _, _, elapsed, _ in rows]
+        queries = [count for _, _, _, count in rows if count is not None]
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for _, status, _, _ in rows if not 200 <= status < 400),
+            'rps': round(len(rows) / duration, 2) if duration else None,
+            'p50_ms': _round(percentile(latencies, 0.50)),
+            'p95_ms': _round(percentile(latencies, 0.95)),
+            'p99_ms': _round(percentile(latencies, 0.99)),
+            'mean_ms': _round(sum(latencies) / len(latencies)) if latencies else None,
+            'queries_per_request': _round(sum(queries) / len(queries)) if queries else None,
+        }
+
+    by_scenario = {}
+    for sample in samples:
+        by_scenario.setdefault(sample[0], []).append(sample)
+    return {
+        'overall': stats(samples),
+        'scenarios': {name: stats(rows) for name, rows in sorted(by_scenario.items())},
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
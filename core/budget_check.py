@@ -0,0 +1,253 @@
+import json
+from dataclasses import dataclass
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from djoser.utils import encode_uid
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core import benchmark, budgets, dataset as synthetic, models
+from core.urls import router
+
+# chamadas de todas as ações do router de core/urls.py, medidas com poucos e com muitos registros
+# (comando check_query_budgets e QueryBudgetTests)
+
+API_PREFIX = '/api/v1/'
+
+# volume de dados das duas rodadas; a quantidade de consultas não pode crescer da primeira para a segunda
+SMALL = {'clients': 3, 'transporters': 3, 'products': 3, 'orders_per_client': 2}
+LARGE = {'clients': 60, 'transporters': 60, 'products': 60, 'orders_per_client': 30}
+
+
+@dataclass
+class Case:
+    name: str
+    method: str
+    path: str
+    body: object = None
+    token: str = None
+    # resposta esperada; 'multipart' envia o corpo como formulário
+    status: int = 200
+    format: str = 'json'
+
+
+@dataclass
+class Measurement:
+    name: str
+    action: tuple
+    budget: int
+    queries: int
+    status: int
+    expected: int
+
+
+def _prefixes():
+    return {basename: prefix for prefix, _, basename in router.registry}
+
+
+# (prefixo, método, ação) de todas as rotas do router
+def router_actions():
+    prefixes = _prefixes()
+    actions = set()
+    for pattern in router.urls:
+        view = pattern.callback
+        for method, action in view.actions.items():
+            # o DRF responde HEAD com a ação do GET
+            if method != 'head':
+                actions.add((prefixes[view.initkwargs['basename']], method.upper(), action))
+    return actions
+
+
+def _action(case):
+    match = resolve(API_PREFIX + case.path.split('?')[0])
+    action, budget = budgets.budget_for(match, case.method)
+    return (_prefixes()[match.func.initkwargs['basename']], case.method, action), budget
+
+
+# usuário com token, sem cliente nem transportador; password é o hash já calculado de benchmark.PASSWORD
+def _user(cpf, password, **fields):
+    user = models.CustomUser.objects.create(cpf=cpf, password=password, **fields)
+    return user, Token.objects.create(user=user).key
+
+
+# as ações que alteram ou removem registros recebem os seus próprios, criados aqui; size controla
+# o tamanho dos corpos das criações (pequeno o bastante para os bulk_create caberem em um INSERT cada)
+def cases(data, staff_token, size):
+    tag = data.tag
+    accounts = dict(data.clients)
+    # os pedidos são sorteados entre os clientes: usa o primeiro que tem algum
+    order = models.Order.objects.filter(client__user__cpf__in=accounts).select_related('client__user').earliest('id')
+    client, client_token = order.client, accounts[order.client.user.cpf]
+    transporter = models.Transporter.objects.get(user__cpf=data.transporters[0][0])
+    transporter_token = data.transporters[0][1]
+    products = data.product_ids[:min(size, len(data.product_ids))]
+    product = models.Product.objects.get(id=data.product_ids[0])
+
+    # um único hash para todos: o PBKDF2 dominaria o tempo da preparação
+    password = make_password(benchmark.PASSWORD)
+
+    def spare(name, **fields):
+        return _user(f'{tag}-{name}', password, **fields)
+
+    profile = {
+        'name': 'Orçamento', 'birthday': '1990-01-01', 'cep': '01001-000', 'street': 'Praça da Sé',
+        'number': 1, 'district': 'Sé', 'city': 'São Paulo', 'uf': 'SP',
+    }
+    license_ = {'name': 'Orçamento', 'birthday': '1985-01-01', 'cnh': '12345678901', 'category_cnh': 'B'}
+    clients = {name: models.Client.objects.create(user=spare(f'c{name}')[0], **profile) for name in ('put', 'patch', 'delete')}
+    transporters = {name: models.Transporter.objects.create(user=spare(f't{name}')[0], **license_) for name in ('put', 'patch', 'delete')}
+    spare_product = models.Product.objects.create(name=f'Orçamento {tag}', value='1.00', weight_kg='1 kg')
+
+    def new_order(buyer, carrier, item):
+        created = models.Order.objects.create(
+            client=buyer, transporter=carrier, total_amount=item.value, status=models.Order.Status.OUT_FOR_DELIVERY,
+        )
+        models.OrderItem.objects.create(order=created, product=item, quantity=1, unit_price=item.value)
+        return created
+
+    orders = {name: new_order(client, transporter, product) for name in ('put', 'patch', 'delete')}
+    # os registros removidos têm um pedido, para a remoção passar pelas cascatas
+    new_order(clients['delete'], transporter, product)
+    new_order(client, transporters['delete'], product)
+    new_order(client, transporter, spare_product)
+
+    new_client_token = spare('newclient')[1]
+    new_transporter_token = spare('newtransporter')[1]
+    me = {method: spare(f'me{method}')[1] for method in ('put', 'patch', 'delete')}
+    set_password_token = spare('setpassword')[1]
+    set_cpf_token = spare('setcpf')[1]
+    updated, _ = spare('put')
+    patched, _ = spare('patch')
+    deleted, _ = spare('delete')
+    inactive, _ = spare('inactive', is_active=False)
+    reset, _ = spare('reset')
+    reset_cpf, _ = spare('resetcpf')
+    import_row = {'role': 'client', 'cpf': synthetic.cpf(int(tag, 16)), 'password': benchmark.PASSWORD, **profile}
+
+    def confirmation(user):
+        return {'uid': encode_uid(user.pk), 'token': default_token_generator.make_token(user)}
+
+    result = []
+    for prefix, _, _ in router.registry:
+        token = {'order': client_token, 'transporter-statistics': transporter_token}.get(prefix, staff_token)
+        result.append(Case(f'GET {prefix}/', 'GET', f'{prefix}/?page_size=50', token=token))
+
+    # leitura e escrita de cada registro
+    detail = {
+        'customuser': (client.user_id, updated.id, patched.id, deleted.id, {'cpf': f'{tag}-put'}, {'cpf': f'{tag}-patch'}),
+        'client': (client.id, clients['put'].id, clients['patch'].id, clients['delete'].id, profile, {'number': 2}),
+        'transporter': (transporter.id, transporters['put'].id, transporters['patch'].id, transporters['delete'].id, license_, {'cnh': '10987654321'}),
+        'product': (product.id, product.id, product.id, spare_product.id,
+                    {'name': product.name, 'value': '2.00', 'weight_kg': product.weight_kg}, {'value': '3.00'}),
+        'order': (order.id, orders['put'].id, orders['patch'].id, orders['delete'].id, {'products': products}, {'products': products[:1]}),
+    }
+    for prefix, (read_id, put_id, patch_id, delete_id, put_body, patch_body) in detail.items():
+        token = client_token if prefix == 'order' else staff_token
+        # a remoção de usuários pelo djoser confirma a senha de quem remove
+        delete_body = {'current_password': benchmark.PASSWORD} if prefix == 'customuser' else None
+        result += [
+            Case(f'GET {prefix}/{{id}}/', 'GET', f'{prefix}/{read_id}/', token=token),
+            Case(f'PUT {prefix}/{{id}}/', 'PUT', f'{prefix}/{put_id}/', put_body, token),
+            Case(f'PATCH {prefix}/{{id}}/', 'PATCH', f'{prefix}/{patch_id}/', patch_body, token),
+            Case(f'DELETE {prefix}/{{id}}/', 'DELETE', f'{prefix}/{delete_id}/', delete_body, token, 204),
+        ]
+
+    # criações
+    result += [
+        Case('POST customuser/', 'POST', 'customuser/',
+             {'cpf': f'{tag}-create', 'password': benchmark.PASSWORD, 're_password': benchmark.PASSWORD}, staff_token, 201),
+        Case('POST customuser/register/', 'POST', 'customuser/register/',
+             {'cpf': f'{tag}-register', 'password': benchmark.PASSWORD}, staff_token, 201),
+        Case('POST customuser/import/', 'POST', 'customuser/import/',
+             {'file': ('usuarios.jsonl', json.dumps(import_row, ensure_ascii=False).encode())}, staff_token, format='multipart'),
+        Case('POST client/', 'POST', 'client/', profile, new_client_token, 201),
+        Case('POST transporter/', 'POST', 'transporter/', license_, new_transporter_token, 201),
+        Case('POST product/', 'POST', 'product/', {'name': f'Orçamento novo {tag}', 'value': '1.00', 'weight_kg': '1 kg'}, staff_token, 201),
+        Case('POST order/', 'POST', 'order/', {'products': products}, client_token, 201),
+        Case('POST order/bulk/', 'POST', 'order/bulk/', [{'products': products} for _ in range(size)], client_token, 201),
+    ]
+
+    # demais ações
+    result += [
+        Case('GET order/export/', 'GET', 'order/export/', token=staff_token),
+        Case('GET order/route/', 'GET', 'order/route/', token=transporter_token),
+        Case('GET product/search/', 'GET', 'product/search/?q=ma', token=staff_token),
+        Case('POST performance/reset/', 'POST', 'performance/reset/', token=staff_token, status=204),
+        Case('GET customuser/me/', 'GET', 'customuser/me/', token=client_token),
+        Case('PUT customuser/me/', 'PUT', 'customuser/me/', {}, me['put']),
+        Case('PATCH customuser/me/', 'PATCH', 'customuser/me/', {}, me['patch']),
+        Case('DELETE customuser/me/', 'DELETE', 'customuser/me/', {'current_password': benchmark.PASSWORD}, me['delete'], 204),
+        Case('POST customuser/activation/', 'POST', 'customuser/activation/', confirmation(inactive), status=204),
+        Case('POST customuser/reset_password_confirm/', 'POST', 'customuser/reset_password_confirm/',
+             {**confirmation(reset), 'new_password': f'{benchmark.PASSWORD}-novo'}, status=204),
+        Case('POST customuser/reset_cpf_confirm/', 'POST', 'customuser/reset_cpf_confirm/',
+             {**confirmation(reset_cpf), 'new_cpf': f'{tag}-resetnew'}, status=204),
+        Case('POST customuser/set_password/', 'POST', 'customuser/set_password/',
+             {'current_password': benchmark.PASSWORD, 'new_password': f'{benchmark.PASSWORD}-novo'}, set_password_token, 204),
+        Case('POST customuser/set_cpf/', 'POST', 'customuser/set_cpf/',
+             {'current_password': benchmark.PASSWORD, 'new_cpf': f'{tag}-setnew'}, set_cpf_token, 204),
+    ]
+    return result
+
+
+def measure(data, staff_token, size):
+    results = {}
+    api = APIClient()
+    for case in cases(data, staff_token, size):
+        # sempre o caminho sem cache, que é o pior caso (inclui os tokens já verificados)
+        cache.clear()
+        api.credentials(**({'HTTP_AUTHORIZATION': f'Token {case.token}'} if case.token else {}))
+        if case.format == 'multipart':
+            body = {name: SimpleUploadedFile(*value) for name, value in case.body.items()}
+            options = {'format': 'multipart'}
+        else:
+            body = json.dumps(case.body) if case.body is not None else None
+            options = {'content_type': 'application/json'}
+        contexts = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        for context in contexts:
+            context.__enter__()
+        try:
+            response = getattr(api, case.method.lower())(API_PREFIX + case.path, data=body, **options)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        finally:
+            for context in contexts:
+                context.__exit__(None, None, None)
+
+        action, budget = _action(case)
+        results[case.name] = Measurement(
+            case.name, action, budget, sum(len(context) for context in contexts), response.status_code, case.status,
+        )
+    return results
+
+
+# mede as duas rodadas no banco atual; devolve [(poucos, muitos)] e as falhas encontradas
+def run():
+    with override_settings(QUERY_BUDGET_MODE='off'):
+        staff_token = _user('budget-staff', make_password(benchmark.PASSWORD), is_staff=True)[1]
+        small = measure(benchmark.seed(**SMALL), staff_token, size=1)
+        large = measure(benchmark.seed(**LARGE), staff_token, size=10)
+
+    failures = []
+    rows = []
+    for name, first in small.items():
+        second = large[name]
+        rows.append((first, second))
+        for measurement in (first, second):
+            if measurement.status != measurement.expected:
+                failures.append(f'{name}: resposta {measurement.status} (esperada: {measurement.expected})')
+        if second.queries > first.queries:
+            failures.append(f'{name}: {first.queries} -> {second.queries} consultas (cresce com a quantidade de registros)')
+        if first.budget is None:
+            failures.append(f'{name}: ação sem orçamento de consultas')
+        elif max(first.queries, second.queries) > first.budget:
+            failures.append(f'{name}: {max(first.queries, second.queries)} consultas (orçamento: {first.budget})')
+
+    covered = {measurement.action for measurement in small.values()}
+    for prefix, method, action in sorted(router_actions() - covered):
+        failures.append(f'{method} {prefix} ({action}): rota sem chamada em core/budget_check.py')
+    return rows, failures
@@ -0,0 +1,47 @@
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# os viewsets declaram o máximo de consultas por ação (contando a autenticação):
+#     query_budgets = {'list': 4, 'retrieve': 4}
+# ações com vários métodos (como "me" do djoser) podem ter um orçamento por método:
+#     query_budgets = {'me': {'get': 1, 'patch': 3}}
+# verificado em toda requisição pelo PerformanceMiddleware e pelo comando check_query_budgets
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# orçamento da ação resolvida para a requisição (None quando não há orçamento declarado)
+def budget_for(resolver_match, method):
+    if resolver_match is None:
+        return None, None
+    view = resolver_match.func
+    viewset = getattr(view, 'cls', None)
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get(method.lower())
+    if viewset is None or action is None:
+        return None, None
+    budget = getattr(viewset, 'query_budgets', {}).get(action)
+    if isinstance(budget, dict):
+        budget = budget.get(method.lower())
+    return action, budget
+
+
+# QUERY_BUDGET_MODE: 'warn' registra um aviso, 'raise' levanta QueryBudgetExceeded, 'off' desliga
+def check(resolver_match, method, queries):
+    mode = getattr(settings, 'QUERY_BUDGET_MODE', 'warn')
+    if mode == 'off':
+        return
+    action, budget = budget_for(resolver_match, method)
+    if budget is None or queries <= budget:
+        return
+    message = (
+        f'{resolver_match.func.cls.__name__}.{action} fez {queries} consultas '
+        f'(orçamento: {budget}) em {resolver_match.route}'
+    )
+    if mode == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
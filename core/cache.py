@@ -0,0 +1,188 @@
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# backend de cache em um arquivo SQLite (WAL) compartilhado pelos workers do mesmo servidor:
+#
+#     CACHES = {'default': {'BACKEND': 'core.cache.SQLiteCache', 'LOCATION': BASE_DIR / 'cache.sqlite3'}}
+#
+# inteiros são gravados como INTEGER (e não em pickle), então incr()/decr() são um único
+# UPDATE ... RETURNING, atômico entre processos; as entradas vencidas são ignoradas na leitura
+# e apagadas de tempos em tempos nas escritas (OPTIONS: MAX_ENTRIES, CULL_FREQUENCY, CULL_EVERY)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)',
+)
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+# entre quantas escritas, em média, a limpeza de vencidos e do excesso roda
+CULL_EVERY = 500
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', CULL_EVERY))
+        self._local = threading.local()
+
+    # uma conexão por thread; depois de um fork (workers do gunicorn) o processo filho abre a sua
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self._path, timeout=PRAGMAS['busy_timeout'] / 1000, isolation_level=None)
+            for name, value in PRAGMAS.items():
+                connection.execute(f'PRAGMA {name} = {value}')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    @staticmethod
+    def _encode(value):
+        # bool é int em Python, mas precisa voltar como bool
+        if type(value) is int and -(1 << 63) <= value < (1 << 63):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    # momento (timestamp) em que a entrada vence; None nunca vence
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache_entry WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()),
+        ).fetchall()
+        return {keys[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+            [(key, self._encode(value), self._expires(timeout))],
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        self._write(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+            [(self.make_and_validate_key(key, version=version), self._encode(value), expires) for key, value in data.items()],
+        )
+        return []
+
+    # grava só se a chave não existir ou estiver vencida
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._write(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+            [(key, self._encode(value), self._expires(timeout), time.time())],
+        )
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    # atômico entre processos: a soma é feita pelo próprio SQLite, mantendo a validade da entrada
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        row = connection.execute(
+            "UPDATE cache_entry SET value = value + ? WHERE key = ? AND typeof(value) = 'integer' "
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            (delta, key, time.time()),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        # valor que não é inteiro (ou chave ausente): lê e grava na mesma transação de escrita
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(row[0]) + delta
+            connection.execute('UPDATE cache_entry SET value = ? WHERE key = ?', (self._encode(value), key))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        if keys:
+            self._connection().executemany('DELETE FROM cache_entry WHERE key = ?', keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
+
+    def _write(self, sql, rows):
+        connection = self._connection()
+        cursor = connection.executemany(sql, rows) if len(rows) > 1 else connection.execute(sql, rows[0])
+        if self._cull_every and random.randrange(self._cull_every) == 0:
+            self._cull(connection)
+        return cursor
+
+    # apaga os vencidos e, acima de MAX_ENTRIES, 1/CULL_FREQUENCY das entradas que vencem primeiro
+    def _cull(self, connection):
+        connection.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache_entry')
+            return
+        connection.execute(
+            'DELETE FROM cache_entry WHERE key IN ('
+            'SELECT key FROM cache_entry ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
@@ -0,0 +1,64 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import quote_etag
+from core import models
+
+VERSION_KEY = 'product-catalog:version'
+
+
+def _timeout():
+    # com o cache local de cada processo, a versão de outros processos expira neste prazo
+    return getattr(settings, 'PRODUCT_CATALOG_CACHE_TIMEOUT', 60)
+
+
+# versão atual do catálogo; só consulta o banco quando não está no cache
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _compute_version()
+        cache.set(VERSION_KEY, version, _timeout())
+    return version
+
+
+# chamada após qualquer alteração de produto
+def invalidate():
+    version = _compute_version()
+    # exclusões não alteram o maior updated_at, então a data de modificação passa a ser agora
+    version['last_modified'] = timezone.now()
+    cache.set(VERSION_KEY, version, _timeout())
+
+
+def _compute_version():
+    stats = models.Product.objects.aggregate(count=Count('id'), last_id=Max('id'), updated=Max('updated_at'))
+    updated = stats['updated']
+    raw = f"{stats['count']}:{stats['last_id']}:{updated.isoformat() if updated else ''}"
+    return {
+        'token': hashlib.sha256(raw.encode()).hexdigest()[:20],
+        'last_modified': updated,
+    }
+
+
+# a mesma URL pode gerar representações diferentes conforme o formato negociado
+def _variant(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = f"{request.build_absolute_uri()}|{getattr(renderer, 'format', '')}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def etag(version, request):
+    return quote_etag(f"{version['token']}-{_variant(request)}")
+
+
+def response_key(version, request):
+    return f"product-catalog:{version['token']}:{_variant(request)}"
+
+
+def get_response_data(version, request):
+    return cache.get(response_key(version, request))
+
+
+def set_response_data(version, request, data):
+    cache.set(response_key(version, request), data, _timeout())
@@ -0,0 +1,322 @@
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from core import catalog, models
+from core.dispatch import dispatcher
+from core.statistics import delivery_month
+
+# massa de dados sintética e determinística (mesma semente e parâmetros, mesmas linhas) para
+# reproduzir localmente problemas que só aparecem com volume. As linhas são gravadas com
+# executemany direto no cursor, com ids atribuídos aqui: sem instâncias de modelo nem sinais,
+# então os totais mensais dos transportadores são somados na geração e os caches, invalidados no fim
+
+# (faixa de CEP de 5 dígitos, cidade, UF, bairros); as faixas casam com core/data/cep_centroids.csv
+CITIES = (
+    ((1000, 5999), 'São Paulo', 'SP', ('Sé', 'Bela Vista', 'Santana', 'Tatuapé', 'Mooca', 'Vila Mariana', 'Pinheiros', 'Lapa', 'Butantã', 'Itaquera')),
+    ((9000, 9999), 'Santo André', 'SP', ('Centro', 'Vila Assunção', 'Jardim', 'Campestre', 'Utinga')),
+    ((13000, 13139), 'Campinas', 'SP', ('Cambuí', 'Barão Geraldo', 'Taquaral', 'Castelo', 'Padre Anchieta')),
+    ((13180, 13189), 'Hortolândia', 'SP', ('Parque Via Nações', 'Jardim Amanda', 'Remanso Campineiro', 'Rosolém')),
+    ((13170, 13179), 'Sumaré', 'SP', ('Centro', 'Pq Santo Antônio', 'Nova Veneza', 'Jardim Maria Antônia')),
+    ((14000, 14114), 'Ribeirão Preto', 'SP', ('Centro', 'Jardim Irajá', 'Vila Tibério', 'Campos Elíseos')),
+    ((20000, 23799), 'Rio de Janeiro', 'RJ', ('Centro', 'Tijuca', 'Copacabana', 'Botafogo', 'Madureira', 'Barra da Tijuca', 'Campo Grande')),
+    ((24000, 24399), 'Niterói', 'RJ', ('Icaraí', 'Centro', 'Santa Rosa', 'Fonseca')),
+    ((30000, 31999), 'Belo Horizonte', 'MG', ('Savassi', 'Funcionários', 'Pampulha', 'Barreiro', 'Santa Efigênia')),
+    ((40000, 42599), 'Salvador', 'BA', ('Barra', 'Pituba', 'Itapuã', 'Liberdade', 'Rio Vermelho')),
+    ((50000, 52999), 'Recife', 'PE', ('Boa Viagem', 'Casa Forte', 'Graças', 'Madalena', 'Várzea')),
+    ((60000, 61599), 'Fortaleza', 'CE', ('Aldeota', 'Meireles', 'Benfica', 'Messejana')),
+    ((70000, 72799), 'Brasília', 'DF', ('Asa Sul', 'Asa Norte', 'Lago Sul', 'Sudoeste', 'Cruzeiro')),
+    ((74000, 74899), 'Goiânia', 'GO', ('Setor Bueno', 'Setor Oeste', 'Setor Marista', 'Campinas')),
+    ((80000, 82999), 'Curitiba', 'PR', ('Batel', 'Água Verde', 'Centro Cívico', 'Portão', 'Boqueirão')),
+    ((88000, 88099), 'Florianópolis', 'SC', ('Centro', 'Trindade', 'Lagoa da Conceição', 'Ingleses')),
+    ((90000, 91999), 'Porto Alegre', 'RS', ('Moinhos de Vento', 'Menino Deus', 'Petrópolis', 'Cidade Baixa', 'Sarandi')),
+)
+STREET_TYPES = ('Rua', 'Rua', 'Rua', 'Avenida', 'Travessa', 'Alameda')
+STREET_NAMES = (
+    'das Flores', 'da Amora', 'Vila Sesamo', 'XV de Novembro', 'Sete de Setembro', 'Tiradentes', 'Dom Pedro II',
+    'Santos Dumont', 'Rui Barbosa', 'Marechal Deodoro', 'das Palmeiras', 'dos Ipês', 'São João', 'Brasil',
+    'Getúlio Vargas', 'Barão de Mauá', 'José Bonifácio', 'das Acácias', 'Monteiro Lobato', 'Cecília Meireles',
+)
+FIRST_NAMES = (
+    'Ana', 'Julia', 'Maria', 'Beatriz', 'Larissa', 'Byanka', 'Kethelyn', 'Fernanda', 'Camila', 'Gabriela',
+    'João', 'Pedro', 'Lucas', 'Bruno', 'Gabriel', 'Rafael', 'Mateus', 'Felipe', 'Gustavo', 'Thiago',
+)
+SURNAMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Ferreira', 'Rodrigues', 'Almeida',
+    'Gomes', 'Moraes', 'Monteiro', 'Tomaz', 'Maciel', 'Barbosa', 'Ribeiro', 'Carvalho', 'Araújo', 'Rocha',
+)
+PRODUCE = (
+    'Mamão', 'Maçã', 'Uva', 'Kiwi', 'Banana', 'Laranja', 'Manga', 'Abacaxi', 'Melancia', 'Morango',
+    'Tomate', 'Alface', 'Cenoura', 'Batata', 'Cebola', 'Abóbora', 'Chuchu', 'Pimentão', 'Couve', 'Mandioca',
+)
+VARIETIES = ('', 'orgânico', 'nacional', 'importado', 'selecionado', 'da estação', 'miúdo', 'graúdo')
+WEIGHTS = ('1 kg', '1 kg', '500 g', '2 kg', 'unidade', 'maço', 'bandeja')
+CNH_CATEGORIES = ('A', 'B', 'AB', 'C', 'D', 'E')
+
+# pedidos dos últimos OPEN_DAYS dias ainda estão em entrega; os anteriores foram entregues ou cancelados
+OPEN_DAYS = 7
+CANCELED_RATE = 0.05
+BATCH_SIZE = 10000
+PASSWORD = 'chaeso123'
+# data fixa, e não a de hoje: rodar em outro dia gera as mesmas linhas
+UNTIL = date(2025, 12, 31)
+
+
+@dataclass
+class Result:
+    rows: dict = field(default_factory=dict)
+    # {model_name: primeiro id gravado}; os demais seguem em sequência
+    first_ids: dict = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def total(self):
+        return sum(self.rows.values())
+
+
+# CPF válido (com dígitos verificadores) a partir de um número de 9 dígitos
+def cpf(number):
+    digits = [int(char) for char in f'{number % 10 ** 9:09d}']
+    for length in (9, 10):
+        check = sum(digit * weight for digit, weight in zip(digits, range(length + 1, 1, -1))) * 10 % 11
+        digits.append(check % 10)
+    return ''.join(map(str, digits))
+
+
+def _next_id(cursor, model):
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {_table(cursor, model)}')
+    return cursor.fetchone()[0] + 1
+
+
+def _table(cursor, model):
+    return cursor.db.ops.quote_name(model._meta.db_table)
+
+
+def _insert_sql(cursor, model, columns):
+    quote = cursor.db.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(columns))
+    return f"INSERT INTO {_table(cursor, model)} ({', '.join(map(quote, columns))}) VALUES ({placeholders})"
+
+
+# grava as linhas do gerador em lotes de batch_size; devolve quantas foram gravadas
+def _bulk_insert(cursor, model, columns, rows, batch_size):
+    sql = _insert_sql(cursor, model, columns)
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+# índices das tabelas (exceto os de chave primária e restrições) com o SQL para recriá-los
+def _secondary_indexes(cursor, models_):
+    tables = [model._meta.db_table for model in models_]
+    placeholders = ', '.join(['%s'] * len(tables))
+    if cursor.db.vendor == 'sqlite':
+        cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+            tables,
+        )
+    elif cursor.db.vendor == 'postgresql':
+        cursor.execute(
+            f'SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename IN ({placeholders}) '
+            f'AND indexname NOT IN (SELECT conname FROM pg_constraint)',
+            tables,
+        )
+    else:
+        return []
+    return cursor.fetchall()
+
+
+class Generator:
+    def __init__(self, clients=1000, transporters=50, products=500, orders=100000, max_items=5, years=3,
+                 seed=0, until=UNTIL, batch_size=BATCH_SIZE, password=PASSWORD, prefix='', using=DEFAULT_DB_ALIAS):
+        self.clients = clients
+        self.transporters = transporters
+        self.products = products
+        self.orders = orders
+        self.max_items = max(1, min(max_items, products))
+        self.days = max(1, int(years * 365))
+        self.seed = seed
+        self.until = until
+        self.batch_size = batch_size
+        self.password = password
+        # prefixo dos CPFs: cargas com a mesma semente no mesmo banco (benchmark) não colidem
+        self.prefix = prefix
+        self.using = using
+
+    def run(self, progress=None):
+        if self.orders and not (self.clients and self.transporters and self.products):
+            raise ValueError('Pedidos precisam de ao menos um cliente, um transportador e um produto.')
+        rng = random.Random(self.seed)
+        connection = connections[self.using]
+        result = Result()
+        started = time.perf_counter()
+
+        with transaction.atomic(using=self.using), connection.cursor() as cursor:
+            self.ops = connection.ops
+            ids = {model: _next_id(cursor, model) for model in (models.CustomUser, models.Client, models.Transporter, models.Product, models.Order)}
+            result.first_ids = {model._meta.model_name: first_id for model, first_id in ids.items()}
+            steps = (
+                (models.CustomUser, ('id', 'password', 'last_login', 'is_superuser', 'cpf', 'is_active', 'is_staff'),
+                 self._users(ids[models.CustomUser])),
+                (models.Client, ('id', 'user_id', 'name', 'birthday', 'cep', 'street', 'number', 'district', 'city', 'uf'),
+                 self._clients(rng, ids[models.Client], ids[models.CustomUser])),
+                (models.Transporter, ('id', 'user_id', 'name', 'birthday', 'cnh', 'category_cnh'),
+                 self._transporters(rng, ids[models.Transporter], ids[models.CustomUser] + self.clients)),
+                (models.Product, ('id', 'name', 'value', 'weight_kg', 'photo', 'photo_variants', 'updated_at'),
+                 self._products(rng, ids[models.Product])),
+            )
+            for model, columns, rows in steps:
+                result.rows[model._meta.model_name] = _bulk_insert(cursor, model, columns, rows, self.batch_size)
+                if progress:
+                    progress(model._meta.model_name, result.rows[model._meta.model_name])
+
+            # carga maior que a tabela de pedidos atual: os índices são removidos e recriados no fim,
+            # de uma vez, o que custa bem menos que atualizá-los a cada linha (dentro da transação:
+            # uma falha também os restaura)
+            deferred = []
+            if self.orders >= ids[models.Order] - 1:
+                deferred = _secondary_indexes(cursor, (models.Order, models.OrderItem))
+            for name, _ in deferred:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+            order_count, item_count, statistics = self._orders(cursor, rng, ids, progress)
+            for _, sql in deferred:
+                cursor.execute(sql)
+            result.rows[models.Order._meta.model_name] = order_count
+            result.rows[models.OrderItem._meta.model_name] = item_count
+            # os transportadores são todos novos: não há totais anteriores para somar
+            result.rows[models.TransporterMonthlyStatistics._meta.model_name] = _bulk_insert(
+                cursor, models.TransporterMonthlyStatistics, ('transporter_id', 'month', 'deliveries', 'total_value'),
+                ((transporter_id, self.ops.adapt_datefield_value(month), deliveries, value)
+                 for (transporter_id, month), (deliveries, value) in sorted(statistics.items())),
+                self.batch_size,
+            )
+
+            # com ids explícitos, as sequências (PostgreSQL) precisam continuar depois deles
+            for sql in connection.ops.sequence_reset_sql(no_style(), [models.CustomUser, models.Client, models.Transporter, models.Product, models.Order]):
+                cursor.execute(sql)
+
+            # os inserts diretos não disparam os sinais que mantêm esses caches
+            transaction.on_commit(dispatcher.invalidate, using=self.using)
+            transaction.on_commit(catalog.invalidate, using=self.using)
+
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _users(self, first_id):
+        # um único hash para todos: o PBKDF2 levaria horas com milhões de usuários; o sal vem da
+        # semente para o hash também se repetir
+        password = make_password(self.password, salt=f'chaeso{self.seed}')
+        offset = self.seed * 10_000_019
+        for index in range(self.clients + self.transporters):
+            yield first_id + index, password, None, False, self.prefix + cpf(offset + index), True, False
+
+    def _name(self, rng):
+        return f'{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)} {rng.choice(SURNAMES)}'
+
+    def _birthday(self, rng):
+        return self.ops.adapt_datefield_value(self.until - timedelta(days=rng.randint(18 * 365, 70 * 365)))
+
+    def _clients(self, rng, first_id, first_user_id):
+        for index in range(self.clients):
+            (low, high), city, uf, districts = rng.choice(CITIES)
+            sector = rng.randint(low, high)
+            yield (
+                first_id + index, first_user_id + index, self._name(rng), self._birthday(rng),
+                f'{sector:05d}-{rng.randint(0, 999):03d}', f'{rng.choice(STREET_TYPES)} {rng.choice(STREET_NAMES)}',
+                rng.randint(1, 3000), rng.choice(districts), city, uf,
+            )
+
+    def _transporters(self, rng, first_id, first_user_id):
+        for index in range(self.transporters):
+            yield (
+                first_id + index, first_user_id + index, self._name(rng), self._birthday(rng),
+                f'{rng.randrange(10 ** 11):011d}', rng.choice(CNH_CATEGORIES),
+            )
+
+    def _products(self, rng, first_id):
+        self.prices = []
+        self.cents = []
+        updated_at = self.ops.adapt_datetimefield_value(self._moment(self.until))
+        for index in range(self.products):
+            cents = rng.randint(100, 5000)
+            price = Decimal(cents).scaleb(-2)
+            self.prices.append(price)
+            self.cents.append(cents)
+            name = ' '.join(filter(None, (rng.choice(PRODUCE), rng.choice(VARIETIES), f'#{index + 1}')))
+            yield first_id + index, name, price, rng.choice(WEIGHTS), '', '{}', updated_at
+
+    def _moment(self, day):
+        return timezone.make_aware(datetime.combine(day, dt_time(10)))
+
+    # pedidos em ordem de data (como seriam criados), com os itens gravados no mesmo ritmo;
+    # devolve também {(transportador, mês): [entregas, valor]} dos pedidos entregues
+    def _orders(self, cursor, rng, ids, progress):
+        order_sql = _insert_sql(cursor, models.Order, ('id', 'client_id', 'transporter_id', 'delivery_date', 'total_amount', 'status', 'status_changed_at'))
+        item_sql = _insert_sql(cursor, models.OrderItem, ('order_id', 'product_id', 'quantity', 'unit_price'))
+        first = self.until - timedelta(days=self.days - 1)
+        days = [
+            (self.ops.adapt_datefield_value(day), self.ops.adapt_datetimefield_value(moment),
+             (self.until - day).days < OPEN_DAYS, delivery_month(moment))
+            for day, moment in ((day, self._moment(day)) for day in (first + timedelta(days=offset) for offset in range(self.days)))
+        ]
+        first_product, first_client, first_transporter = ids[models.Product], ids[models.Client], ids[models.Transporter]
+        # valores gravados como float (centavos / 100): o banco guarda o mesmo número que guardaria
+        # para o Decimal, sem criar e adaptar um Decimal por linha
+        cents = self.cents
+        prices = [value / 100 for value in cents]
+        # random() é bem mais rápido que randrange()/sample() e basta para distribuição uniforme
+        random_ = rng.random
+        products, clients, transporters, max_items = self.products, self.clients, self.transporters, self.max_items
+        open_status, delivered, canceled = models.Order.Status.OUT_FOR_DELIVERY, models.Order.Status.DELIVERED, models.Order.Status.CANCELED
+
+        statistics = {}
+        orders, items, item_count = [], [], 0
+        add_order, add_item = orders.append, items.append
+        first_order = order_id = ids[models.Order]
+        # os pedidos são distribuídos igualmente entre os dias; os primeiros recebem as sobras
+        per_day, extra = divmod(self.orders, self.days)
+        for day_index, (delivery_date, changed_at, is_open, month) in enumerate(days):
+            for _ in range(per_day + (day_index < extra)):
+                # soma em centavos, convertida uma vez por pedido
+                total = 0
+                for position in {int(random_() * products) for _ in range(int(random_() * max_items) + 1)}:
+                    quantity = int(random_() * 3) + 1
+                    total += cents[position] * quantity
+                    add_item((order_id, first_product + position, quantity, prices[position]))
+                transporter_id = first_transporter + int(random_() * transporters)
+                if is_open:
+                    status = open_status
+                elif random_() < CANCELED_RATE:
+                    status = canceled
+                else:
+                    status = delivered
+                    entry = statistics.setdefault((transporter_id, month), [0, 0])
+                    entry[0] += 1
+                    entry[1] += total
+                add_order((order_id, first_client + int(random_() * clients), transporter_id, delivery_date, total / 100, status, changed_at))
+                order_id += 1
+
+                if len(orders) >= self.batch_size or order_id - first_order == self.orders:
+                    cursor.executemany(order_sql, orders)
+                    cursor.executemany(item_sql, items)
+                    item_count += len(items)
+                    # esvazia as listas no lugar: add_order e add_item continuam valendo
+                    orders.clear()
+                    items.clear()
+                    if progress:
+                        progress(models.Order._meta.model_name, order_id - first_order)
+        return self.orders, item_count, {key: (deliveries, Decimal(value).scaleb(-2)) for key, (deliveries, value) in statistics.items()}
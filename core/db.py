@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# aplica os PRAGMAs de SQLITE_PRAGMAS a cada nova conexão
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    # direto na conexão sqlite3: a configuração não conta como consulta da requisição (core.budgets)
+    raw = connection.connection
+    for name, value in pragmas.items():
+        raw.execute(f'PRAGMA {name} = {value}')
+    # a conexão de leitura nunca escreve, mesmo que algum código tente
+    if connection.settings_dict.get('READ_ONLY'):
+        raw.execute('PRAGMA query_only = 1')
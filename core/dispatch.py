@@ -0,0 +1,137 @@
+import heapq
+import threading
+import time
+from django.conf import settings
+from django.db.models import Count, Q
+from core import models
+
+
+# escolhe o transportador com menos pedidos em aberto; mantém em memória a carga de cada
+# transportador e um heap por categoria de CNH, atualizados a cada mudança de pedido
+class TransporterDispatcher:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loads = None
+        self._categories = {}
+        self._heaps = {}
+        self._loaded_at = 0.0
+
+    @property
+    def resync_interval(self):
+        # outros processos também alteram pedidos; de tempos em tempos o índice é recarregado do banco
+        return getattr(settings, 'DISPATCH_RESYNC_SECONDS', 300)
+
+    @staticmethod
+    def normalize_category(category):
+        category = (category or '').strip().upper()
+        if category and (len(category) != 1 or not category.isalpha()):
+            raise ValueError(category)
+        return category or None
+
+    # escolhe e já reserva uma unidade de carga, para que criações simultâneas no processo não caiam
+    # todas no mesmo transportador; quem chama devolve a reserva com release() ao confirmar ou desfazer
+    def pick(self, category=None):
+        category = self.normalize_category(category)
+        with self._lock:
+            self._ensure_loaded()
+            transporter_id = self._peek(category)
+            if transporter_id is not None:
+                self._set_load(transporter_id, self._loads[transporter_id] + 1)
+            return transporter_id
+
+    def reserve(self, categories):
+        # escolhe um transportador para cada item, já contando a carga dos itens anteriores;
+        # usado nas gravações em lote, que não disparam os sinais de post_save
+        with self._lock:
+            self._ensure_loaded()
+            chosen = []
+            for category in categories:
+                transporter_id = self._peek(self.normalize_category(category))
+                if transporter_id is not None:
+                    self._set_load(transporter_id, self._loads[transporter_id] + 1)
+                chosen.append(transporter_id)
+            return chosen
+
+    def release(self, transporter_id):
+        self.adjust(transporter_id, -1)
+
+    def adjust(self, transporter_id, delta):
+        with self._lock:
+            if self._loads is None or transporter_id not in self._loads:
+                return
+            self._set_load(transporter_id, max(0, self._loads[transporter_id] + delta))
+
+    def register(self, transporter_id, category):
+        with self._lock:
+            if self._loads is None:
+                return
+            if transporter_id in self._loads and self._categories.get(transporter_id) == category:
+                return
+            self._categories[transporter_id] = category
+            self._loads.setdefault(transporter_id, 0)
+            self._push(transporter_id)
+
+    def discard(self, transporter_id):
+        with self._lock:
+            if self._loads is not None:
+                self._loads.pop(transporter_id, None)
+                self._categories.pop(transporter_id, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._loads = None
+
+    def _ensure_loaded(self):
+        if self._loads is None or time.monotonic() - self._loaded_at > self.resync_interval:
+            self._load()
+
+    def _load(self):
+        rows = (
+            models.Transporter.objects
+            .annotate(open_orders=Count('order', filter=Q(order__status__in=models.Order.OPEN_STATUSES)))
+            .values_list('id', 'category_cnh', 'open_orders')
+        )
+        self._loads = {}
+        self._categories = {}
+        self._heaps = {}
+        for transporter_id, category, open_orders in rows:
+            self._loads[transporter_id] = open_orders
+            self._categories[transporter_id] = category
+            self._push(transporter_id)
+        self._loaded_at = time.monotonic()
+
+    def _keys(self, transporter_id):
+        # None é o heap geral; cada letra da CNH (ex.: "AB") tem o seu
+        return [None] + sorted(set((self._categories.get(transporter_id) or '').upper()))
+
+    def _push(self, transporter_id):
+        entry = (self._loads[transporter_id], transporter_id)
+        for key in self._keys(transporter_id):
+            heap = self._heaps.setdefault(key, [])
+            heapq.heappush(heap, entry)
+            # descarta entradas antigas quando o heap cresce demais
+            if len(heap) > 2 * len(self._loads) + 64:
+                self._heaps[key] = self._rebuild(key)
+
+    def _rebuild(self, key):
+        heap = [(load, transporter_id) for transporter_id, load in self._loads.items()
+                if key is None or key in (self._categories.get(transporter_id) or '').upper()]
+        heapq.heapify(heap)
+        return heap
+
+    def _set_load(self, transporter_id, load):
+        self._loads[transporter_id] = load
+        self._push(transporter_id)
+
+    def _peek(self, category):
+        heap = self._heaps.get(category)
+        while heap:
+            load, transporter_id = heap[0]
+            if self._loads.get(transporter_id) == load and (
+                    category is None or category in (self._categories.get(transporter_id) or '').upper()):
+                return transporter_id
+            heapq.heappop(heap)
+        return None
+
+
+dispatcher = TransporterDispatcher()
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from core import models
+
+logger = logging.getLogger(__name__)
+
+# eventos lidos do histórico por consulta
+BACKLOG_LIMIT = 500
+# eventos apagados por transação na limpeza do histórico
+PURGE_BATCH_SIZE = 5000
+
+
+# pub/sub em memória dos eventos de pedidos; cada assinante é uma fila asyncio do seu event loop
+class OrderEventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, keys):
+        subscription = Subscription(self, keys)
+        with self._lock:
+            for key in keys:
+                self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[key]
+
+    # pode ser chamado de qualquer thread (ex.: o on_commit de uma view síncrona)
+    def publish(self, events):
+        for event in events:
+            with self._lock:
+                subscriptions = set()
+                for key in recipients(event):
+                    subscriptions.update(self._subscribers.get(key, ()))
+            for subscription in subscriptions:
+                subscription.deliver(event)
+
+
+class Subscription:
+    def __init__(self, broker, keys):
+        self.broker = broker
+        self.keys = keys
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'ORDER_EVENTS_QUEUE_SIZE', 1000))
+        # fila cheia: os eventos perdidos são relidos do histórico
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # event loop já encerrado: a conexão caiu
+            self.broker.unsubscribe(self)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+broker = OrderEventBroker()
+
+
+def recipients(event):
+    return (('client', event['client_id']), ('transporter', event['transporter_id']))
+
+
+def role_keys(role):
+    keys = []
+    if role.client_id is not None:
+        keys.append(('client', role.client_id))
+    if role.transporter_id is not None:
+        keys.append(('transporter', role.transporter_id))
+    return keys
+
+
+def event_data(event):
+    return {
+        'id': event.id,
+        'order_id': event.order_id,
+        'client_id': event.client_id,
+        'transporter_id': event.transporter_id,
+        'status': event.status,
+        'status_display': models.Order.Status(event.status).label,
+        'created_at': event.created_at,
+    }
+
+
+# grava os eventos na transação atual e os publica depois do commit
+def record_events(orders):
+    events = models.OrderEvent.objects.bulk_create([
+        models.OrderEvent(
+            order_id=order.id,
+            client_id=order.client_id,
+            transporter_id=order.transporter_id,
+            status=order.status,
+            created_at=order.status_changed_at or timezone.now(),
+        )
+        for order in orders
+    ])
+    data = [event_data(event) for event in events]
+    transaction.on_commit(lambda: _publish(data))
+
+
+def _publish(data):
+    try:
+        broker.publish(data)
+    except Exception:
+        logger.exception("Falha ao publicar eventos de pedidos")
+
+
+# eventos do histórico posteriores a after_id, para retomar a conexão ou alcançar outros processos
+def load_events(keys, after_id, limit=BACKLOG_LIMIT):
+    query = None
+    for kind, object_id in keys:
+        condition = Q(**{f'{kind}_id': object_id})
+        query = condition if query is None else query | condition
+    if query is None:
+        return []
+    return [
+        event_data(event)
+        for event in models.OrderEvent.objects.filter(query, id__gt=after_id).order_by('id')[:limit]
+    ]
+
+
+def last_event_id():
+    return models.OrderEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+# apaga os eventos anteriores a before (pelo índice de created_at), em lotes curtos para não
+# bloquear as gravações; conexões que retomarem de um evento apagado recebem só os seguintes
+def purge_events(before, batch_size=PURGE_BATCH_SIZE):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(models.OrderEvent.objects.filter(created_at__lt=before).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += models.OrderEvent.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,89 @@
+import csv
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from core import models
+
+# colunas lidas de cada pedido, já com os dados de cliente e transportador (um único JOIN)
+ORDER_COLUMNS = (
+    ('id', 'id'),
+    ('delivery_date', 'delivery_date'),
+    ('status', 'status'),
+    ('status_changed_at', 'status_changed_at'),
+    ('total_amount', 'total_amount'),
+    ('client_id', 'client_id'),
+    ('client_name', 'client__name'),
+    ('client_city', 'client__city'),
+    ('client_uf', 'client__uf'),
+    ('transporter_id', 'transporter_id'),
+    ('transporter_name', 'transporter__name'),
+    ('transporter_category_cnh', 'transporter__category_cnh'),
+)
+
+CSV_HEADER = [name for name, _ in ORDER_COLUMNS] + ['status_display', 'products']
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+# linhas do export: os pedidos são lidos em blocos e os produtos de cada bloco em uma consulta
+def iter_order_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    lookups = [lookup for _, lookup in ORDER_COLUMNS]
+    names = [name for name, _ in ORDER_COLUMNS]
+    rows = queryset.order_by('id').values_list(*lookups).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        items = _load_items([row[0] for row in chunk])
+        for row in chunk:
+            order = dict(zip(names, row))
+            order['status_display'] = models.Order.Status(order['status']).label
+            order['products'] = items.get(order['id'], [])
+            yield order
+
+
+def _load_items(order_ids):
+    items = {}
+    rows = (
+        models.OrderItem.objects
+        .filter(order_id__in=order_ids)
+        .order_by('order_id', 'id')
+        .values_list('order_id', 'product_id', 'product__name', 'quantity', 'unit_price')
+    )
+    for order_id, product_id, name, quantity, unit_price in rows:
+        items.setdefault(order_id, []).append({
+            'product_id': product_id,
+            'name': name,
+            'quantity': quantity,
+            'unit_price': unit_price,
+        })
+    return items
+
+
+# arquivo "de mentira" para o csv.writer: devolve a linha em vez de guardá-la
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        # produtos em uma única coluna: "id:quantidade:preço" separados por "|"
+        products = '|'.join(
+            f"{item['product_id']}:{item['quantity']}:{'' if item['unit_price'] is None else item['unit_price']}"
+            for item in row['products']
+        )
+        yield writer.writerow([row[name] for name, _ in ORDER_COLUMNS] + [row['status_display'], products])
+
+
+def stream_ndjson(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+    'ndjson': ('application/x-ndjson; charset=utf-8', stream_ndjson),
+}
@@ -0,0 +1,328 @@
+import threading
+from django.db.models.fields.files import FieldFile
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from core import performance
+
+# campos cujo valor lido do banco já é a representação em JSON
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+# campos que passam pelo to_representation do próprio DRF (formatação de datas, decimais...)
+CONVERTED_FIELDS = (
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.TimeField,
+    serializers.UUIDField,
+)
+
+
+class NotFlattenable(Exception):
+    pass
+
+
+# plano de serialização de uma classe de serializer a partir de linhas de .values(),
+# montado uma única vez e com a mesma saída de serializer.data
+# (options são os argumentos ?fields= / ?expand= repassados ao serializer)
+class FlatPlan:
+    def __init__(self, serializer_class, model=None, prefix='', **options):
+        serializer = serializer_class(**options)
+        self.model = model or serializer.Meta.model
+        self.lookups = []
+        # acessor reverso -> (nome do FK no modelo relacionado, lookups, planos filhos)
+        self.related = {}
+        self.steps = self._compile(serializer, self.model, prefix, ())
+
+    def _add_lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+
+    def _compile(self, serializer, model, prefix, path):
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        fields.update({field.name: field for field in model._meta.concrete_fields})
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            field_path = path + (name,)
+            source = field.source
+
+            flat_related = getattr(field, 'flat_related', None)
+            if flat_related is not None:
+                accessor, lookup = flat_related
+                self._related(model, prefix, accessor)[1].add(lookup)
+                steps.append((name, 'related_values', (accessor, lookup), field_path))
+            elif getattr(field, 'flat_through', None) is not None:
+                # lista de objetos ligados por uma tabela intermediária (ex.: produtos pelos itens do pedido),
+                # lidos no mesmo SELECT dos registros intermediários
+                accessor, through = field.flat_through
+                through_model = self._related_model(model, accessor)
+                target = through_model._meta.get_field(through).related_model
+                child = FlatPlan(type(field.child), model=target, prefix=f'{through}__')
+                self._related(model, prefix, accessor)[2][name] = child
+                steps.append((name, 'related_rows', (accessor, name), field_path))
+            elif isinstance(field, serializers.ListSerializer):
+                child = FlatPlan(type(field.child), model=self._related_model(model, source))
+                self._related(model, prefix, source)[2][name] = child
+                steps.append((name, 'related_rows', (source, name), field_path))
+            elif isinstance(field, serializers.BaseSerializer):
+                model_field = fields.get(source)
+                if model_field is None or not model_field.is_relation or model_field.many_to_many:
+                    raise NotFlattenable(name)
+                self._add_lookup(prefix + model_field.attname)
+                nested = self._compile(field, model_field.related_model, f'{prefix}{model_field.name}__', field_path)
+                steps.append((name, 'nested', (prefix + model_field.attname, nested), field_path))
+            elif isinstance(field, serializers.SerializerMethodField):
+                # o método recebe um objeto com as colunas do modelo
+                for attname in (model_field.attname for model_field in model._meta.concrete_fields):
+                    self._add_lookup(prefix + attname)
+                steps.append((name, 'method', (prefix, field.method_name), field_path))
+            elif source.startswith('get_') and source.endswith('_display') and source[4:-8] in fields:
+                model_field = fields[source[4:-8]]
+                self._add_lookup(prefix + model_field.attname)
+                labels = {value: str(label) for value, label in model_field.flatchoices}
+                steps.append((name, 'display', (prefix + model_field.attname, labels), field_path))
+            elif source in fields:
+                lookup = prefix + fields[source].attname
+                self._add_lookup(lookup)
+                if isinstance(field, serializers.FileField):
+                    steps.append((name, 'file', (lookup, fields[source]), field_path))
+                elif isinstance(field, IDENTITY_FIELDS):
+                    steps.append((name, 'identity', lookup, field_path))
+                elif isinstance(field, CONVERTED_FIELDS):
+                    steps.append((name, 'convert', lookup, field_path))
+                else:
+                    raise NotFlattenable(name)
+            else:
+                raise NotFlattenable(name)
+        return steps
+
+    def _related_model(self, model, accessor):
+        for relation in model._meta.related_objects:
+            if relation.get_accessor_name() == accessor and relation.one_to_many:
+                return relation.related_model
+        raise NotFlattenable(accessor)
+
+    def _related(self, model, prefix, accessor):
+        if prefix:
+            raise NotFlattenable(accessor)
+        if accessor not in self.related:
+            related_model = self._related_model(model, accessor)
+            relation = next(relation for relation in model._meta.related_objects if relation.get_accessor_name() == accessor)
+            self.related[accessor] = (relation.field.attname, set(), {}, related_model)
+        self._add_lookup(model._meta.pk.attname)
+        return self.related[accessor]
+
+    # serializa as linhas com os campos ligados a uma instância do serializer (contexto da requisição)
+    def serialize(self, rows, serializer):
+        related = self._load_related(rows)
+        steps = self._bind(self.steps, serializer, related)
+        return [{name: step(row) for name, step in steps} for row in rows]
+
+    def _load_related(self, rows):
+        if not self.related:
+            return {}
+        pk = self.model._meta.pk.attname
+        ids = [row[pk] for row in rows]
+        loaded = {}
+        for accessor, (fk, lookups, children, related_model) in self.related.items():
+            fetch = [fk, *lookups]
+            for child in children.values():
+                fetch += [lookup for lookup in child.lookups if lookup not in fetch]
+            groups = {}
+            for row in related_model._default_manager.filter(**{f'{fk}__in': ids}).order_by('pk').values(*fetch):
+                groups.setdefault(row[fk], []).append(row)
+            loaded[accessor] = (pk, groups)
+        return loaded
+
+    def _bind(self, steps, serializer, related):
+        bound = []
+        for name, kind, arg, path in steps:
+            field = serializer.fields[name]
+            bound.append((name, _STEP_BUILDERS[kind](self, arg, field, serializer, related)))
+        return bound
+
+
+def _identity(plan, lookup, field, serializer, related):
+    return lambda row: row[lookup]
+
+
+def _convert(plan, lookup, field, serializer, related):
+    to_representation = field.to_representation
+
+    def step(row):
+        value = row[lookup]
+        return None if value is None else to_representation(value)
+    return step
+
+
+def _file(plan, arg, field, serializer, related):
+    lookup, model_field = arg
+    to_representation = field.to_representation
+
+    def step(row):
+        name = row[lookup]
+        return to_representation(FieldFile(None, model_field, name)) if name else None
+    return step
+
+
+def _display(plan, arg, field, serializer, related):
+    lookup, labels = arg
+    return lambda row: labels.get(row[lookup], row[lookup])
+
+
+def _nested(plan, arg, field, serializer, related):
+    lookup, steps = arg
+    nested = plan._bind(steps, field, related)
+
+    def step(row):
+        if row[lookup] is None:
+            return None
+        return {name: nested_step(row) for name, nested_step in nested}
+    return step
+
+
+def _method(plan, arg, field, serializer, related):
+    prefix, method_name = arg
+    method = getattr(serializer, method_name)
+    return lambda row: method(_RowObject(row, prefix))
+
+
+def _related_values(plan, arg, field, serializer, related):
+    accessor, lookup = arg
+    pk, groups = related[accessor]
+    return lambda row: [item[lookup] for item in groups.get(row[pk], ())]
+
+
+def _related_rows(plan, arg, field, serializer, related):
+    accessor, name = arg
+    pk, groups = related[accessor]
+    child = plan.related[accessor][2][name]
+    steps = child._bind(child.steps, field.child, {})
+    return lambda row: [{child_name: child_step(item) for child_name, child_step in steps} for item in groups.get(row[pk], ())]
+
+
+_STEP_BUILDERS = {
+    'identity': _identity,
+    'convert': _convert,
+    'file': _file,
+    'display': _display,
+    'nested': _nested,
+    'method': _method,
+    'related_values': _related_values,
+    'related_rows': _related_rows,
+}
+
+
+# objeto com as colunas da linha como atributos, para os SerializerMethodField
+class _RowObject:
+    __slots__ = ('_row', '_prefix')
+
+    def __init__(self, row, prefix):
+        self._row = row
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        try:
+            return self._row[self._prefix + name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+# cada combinação de ?fields= / ?expand= tem o seu plano; o limite evita crescer sem fim
+PLAN_CACHE_SIZE = 512
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+# plano da classe de serializer (None se algum campo não puder ser lido de .values())
+def get_plan(serializer_class, **options):
+    key = (serializer_class, tuple(sorted(options.items())))
+    try:
+        return _plans[key]
+    except KeyError:
+        pass
+    with _plans_lock:
+        if key not in _plans:
+            if len(_plans) >= PLAN_CACHE_SIZE:
+                _plans.clear()
+            try:
+                _plans[key] = FlatPlan(serializer_class, **options)
+            except (NotFlattenable, AttributeError):
+                _plans[key] = None
+        return _plans[key]
+
+
+# ?fields=id,name e ?expand=products, normalizados (ordenados e sem repetição)
+def sparse_options(request):
+    options = {}
+    for name in ('fields', 'expand'):
+        value = request.query_params.get(name)
+        if value:
+            options[name] = tuple(sorted({item.strip() for item in value.split(',') if item.strip()}))
+    return options
+
+
+# list e retrieve a partir de .values(), sem instanciar modelos nem passar pelos campos do DRF;
+# nas leituras, ?fields= e ?expand= chegam ao serializer (SparseFieldsMixin) e reduzem as colunas do SELECT
+class FlatReadMixin:
+    def get_sparse_options(self):
+        if self.request.method not in SAFE_METHODS or not hasattr(self.get_serializer_class(), 'expandable_fields'):
+            return {}
+        return sparse_options(self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **self.get_sparse_options(), **kwargs)
+
+    # caminho sem plano: os campos expandidos ainda vêm em um único prefetch/JOIN
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        expand = self.get_sparse_options().get('expand')
+        if expand:
+            queryset = self.get_serializer_class().expand_queryset(queryset, expand)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        plan = get_plan(self.get_serializer_class(), **self.get_sparse_options())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        # as colunas da ordenação da paginação por chave entram mesmo que não sejam pedidas
+        ordering = [item.lstrip('-') for item in getattr(self.paginator, 'ordering', ())]
+        lookups = plan.lookups + [name for name in ordering if name not in plan.lookups]
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*lookups)
+        serializer = self.get_serializer()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            with performance.phase('serialize'):
+                data = plan.serialize(page, serializer)
+            return self.get_paginated_response(data)
+        rows = list(rows)
+        with performance.phase('serialize'):
+            data = plan.serialize(rows, serializer)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        plan = get_plan(self.get_serializer_class(), **self.get_sparse_options())
+        if plan is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*plan.lookups)
+        row = get_object_or_404(rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        serializer = self.get_serializer()
+        with performance.phase('serialize'):
+            data = plan.serialize([row], serializer)[0]
+        return Response(data)
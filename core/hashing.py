@@ -0,0 +1,16 @@
+import os
+import django
+from django.contrib.auth.hashers import make_password
+
+# funções dos processos do pool de core.imports; o módulo não importa modelos, para poder ser
+# carregado antes do django.setup() nos processos novos (contexto "spawn")
+
+
+def init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+# o PBKDF2 de cada senha é o que domina o tempo da importação
+def hash_passwords(passwords):
+    return [make_password(password or None) for password in passwords]
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from core import catalog, models
+
+logger = logging.getLogger(__name__)
+
+# maior lado, em pixels, de cada variante
+DEFAULT_VARIANTS = {
+    'thumbnail': 200,
+    'medium': 600,
+    'full': 1600,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANTS_DIR = 'product_variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PRODUCT_IMAGE_WORKERS', 2),
+                thread_name_prefix='product-images',
+            )
+        return _executor
+
+
+# agenda a geração das variantes para depois do commit, fora da thread da requisição
+def schedule_variants(product_id, name):
+    if getattr(settings, 'PRODUCT_IMAGE_ASYNC', True):
+        transaction.on_commit(lambda: _get_executor().submit(process_product_photo, product_id, name, True))
+    else:
+        transaction.on_commit(lambda: process_product_photo(product_id, name))
+
+
+def process_product_photo(product_id, name, close_connections=False):
+    try:
+        variants = generate_variants(name)
+        # só grava se a foto não foi trocada enquanto as variantes eram geradas
+        updated = models.Product.objects.filter(pk=product_id, photo=name).update(
+            photo_variants=variants, updated_at=timezone.now(),
+        )
+        if updated:
+            catalog.invalidate()
+    except Exception:
+        logger.exception("Falha ao gerar as variantes da foto %s do produto %s", name, product_id)
+    finally:
+        # fecha as conexões abertas pela thread do pool
+        if close_connections:
+            connections.close_all()
+
+
+def generate_variants(name, storage=default_storage):
+    with storage.open(name, 'rb') as file:
+        content = file.read()
+
+    image = Image.open(BytesIO(content))
+    image = ImageOps.exif_transpose(image)
+
+    # o nome leva um hash do conteúdo, então cada arquivo gerado pode ser cacheado para sempre
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    base = f'{VARIANTS_DIR}/{PurePosixPath(name).stem}.{digest}'
+
+    variants = {}
+    for variant, size in getattr(settings, 'PRODUCT_IMAGE_VARIANTS', DEFAULT_VARIANTS).items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {}
+        for extension, (image_format, options) in FORMATS.items():
+            path = f'{base}.{variant}.{extension}'
+            if not storage.exists(path):
+                buffer = BytesIO()
+                _prepare(resized, image_format).save(buffer, image_format, **options)
+                path = storage.save(path, ContentFile(buffer.getvalue()))
+            variants[variant][extension] = path
+    return variants
+
+
+def _prepare(image, image_format):
+    # JPEG não tem transparência: aplica a imagem sobre um fundo branco
+    if image_format == 'JPEG' and image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return image
+
+
+# converte os caminhos das variantes em URLs (absolutas quando há requisição)
+def variant_urls(variants, request=None, storage=default_storage):
+    urls = {}
+    for variant, files in (variants or {}).items():
+        urls[variant] = {}
+        for extension, path in files.items():
+            url = storage.url(path)
+            urls[variant][extension] = request.build_absolute_uri(url) if request is not None else url
+    return urls
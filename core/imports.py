@@ -0,0 +1,235 @@
+import codecs
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from core import models, serializers
+from core.hashing import hash_passwords, init_worker
+from core.dispatch import dispatcher
+
+# importação em lote de usuários com o perfil de cliente ou transportador, a partir de CSV ou JSONL
+# (uma linha por usuário: role, cpf, password e os campos do perfil, como no cadastro pela API)
+
+FORMATS = ('csv', 'jsonl')
+ROLES = {
+    'client': (models.Client, serializers.ClientSerializer),
+    'transporter': (models.Transporter, serializers.TransporterSerializer),
+}
+CPF_MAX_LENGTH = models.CustomUser._meta.get_field('cpf').max_length
+
+
+def detect_format(name='', content_type=''):
+    if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'jsonl'
+    return 'csv'
+
+
+# (número da linha, registro) de um arquivo binário, sem carregá-lo inteiro na memória
+def read_records(file, input_format):
+    text = codecs.getreader('utf-8-sig')(file)
+    if input_format == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, {key: value for key, value in record.items() if key is not None}
+        return
+    for line_number, line in enumerate(text, start=1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else {'__invalid__': line}
+
+
+# identifica o arquivo de entrada para a retomada (tamanho e início do conteúdo)
+def fingerprint(path):
+    digest = hashlib.sha256(str(os.path.getsize(path)).encode())
+    with open(path, 'rb') as file:
+        digest.update(file.read(1 << 20))
+    return digest.hexdigest()
+
+
+# grava o arquivo recebido pela API em USER_IMPORT_DIR; o nome é o sha256 do conteúdo, então
+# reenviar o mesmo arquivo depois de uma falha retoma a importação do checkpoint
+def save_upload(chunks):
+    directory = Path(getattr(settings, 'USER_IMPORT_DIR', Path(settings.BASE_DIR) / 'imports'))
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    temporary = directory / f'upload-{os.getpid()}-{id(digest)}.tmp'
+    with open(temporary, 'wb') as file:
+        for chunk in chunks:
+            digest.update(chunk)
+            file.write(chunk)
+    path = directory / f'{digest.hexdigest()}.upload'
+    os.replace(temporary, path)
+    return path, Checkpoint(directory / f'{digest.hexdigest()}.checkpoint.json', digest.hexdigest())
+
+
+@dataclass
+class Progress:
+    position: int = 0
+    created: int = 0
+    skipped: int = 0
+    invalid: int = 0
+
+
+# progresso gravado depois de cada lote confirmado; a próxima execução com o mesmo arquivo continua dali
+class Checkpoint:
+    def __init__(self, path, source):
+        self.path = Path(path)
+        self.source = source
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return Progress()
+        if data.get('source') != self.source:
+            return Progress()
+        return Progress(**{name: data.get(name, 0) for name in Progress.__dataclass_fields__})
+
+    def save(self, progress):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'source': self.source, **asdict(progress)}))
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+class UserImporter:
+    def __init__(self, role=None, chunk_size=None, workers=None, checkpoint=None):
+        if role is not None and role not in ROLES:
+            raise ValueError(role)
+        self.role = role
+        self.chunk_size = chunk_size or getattr(settings, 'USER_IMPORT_CHUNK_SIZE', 500)
+        self.workers = workers if workers is not None else (getattr(settings, 'USER_IMPORT_WORKERS', None) or os.cpu_count())
+        self.checkpoint = checkpoint
+
+    # gera eventos {'event': 'error' | 'progress' | 'done', ...}; o hash das senhas de um lote
+    # roda no pool enquanto o lote anterior é gravado
+    def run(self, records):
+        progress = self.checkpoint.load() if self.checkpoint else Progress()
+        start = progress.position
+        if start:
+            yield {'event': 'resume', **asdict(progress)}
+        existing = set(models.CustomUser.objects.values_list('cpf', flat=True))
+        self._race_skipped = 0
+
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'chaeso.settings'),),
+            )
+        try:
+            pending = None
+            chunk = []
+            for index, (line_number, record) in enumerate(records, start=1):
+                if index <= start:
+                    continue
+                row, errors = self._validate(record, existing)
+                if errors is None:
+                    progress.skipped += 1
+                elif errors:
+                    progress.invalid += 1
+                    yield {'event': 'error', 'line': line_number, 'errors': errors}
+                else:
+                    existing.add(row['cpf'])
+                    chunk.append(row)
+                progress.position = index
+
+                if len(chunk) >= self.chunk_size:
+                    submitted = self._submit(pool, chunk, progress)
+                    chunk = []
+                    if pending:
+                        yield self._write(*pending, progress)
+                    pending = submitted
+
+            if pending:
+                yield self._write(*pending, progress)
+            if chunk:
+                yield self._write(*self._submit(pool, chunk, progress), progress)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        if self.checkpoint:
+            self.checkpoint.clear()
+        yield {'event': 'done', **asdict(progress)}
+
+    # (linha validada, {}) ; (None, None) se o CPF já existe ; (None, erros) se for inválida
+    def _validate(self, record, existing):
+        if '__invalid__' in record:
+            return None, {'non_field_errors': ["Linha não é um objeto JSON."]}
+        cpf = str(record.get('cpf') or '').strip()
+        if not cpf:
+            return None, {'cpf': ["Este campo é obrigatório."]}
+        if len(cpf) > CPF_MAX_LENGTH:
+            return None, {'cpf': [f"Informe no máximo {CPF_MAX_LENGTH} caracteres."]}
+        if cpf in existing:
+            return None, None
+
+        role = str(record.get('role') or self.role or '').strip()
+        if role not in ROLES:
+            return None, {'role': [f"Use um destes papéis: {', '.join(ROLES)}."]}
+        serializer = ROLES[role][1](data={key: value for key, value in record.items() if key not in ('cpf', 'password', 'role')})
+        if not serializer.is_valid():
+            return None, serializer.errors
+        return {'cpf': cpf, 'password': str(record.get('password') or '') or None, 'role': role, 'profile': serializer.validated_data}, {}
+
+    def _hash(self, pool, chunk):
+        passwords = [row['password'] for row in chunk]
+        if pool is None:
+            return [hash_passwords(passwords)]
+        # uma fatia por processo, para ocupar todo o pool com um lote
+        size = -(-len(passwords) // self.workers)
+        return [pool.submit(hash_passwords, passwords[offset:offset + size]) for offset in range(0, len(passwords), size)]
+
+    # lote com o hash em andamento e o progresso até ele; o progresso só é gravado depois do lote,
+    # junto com os descartes por concorrência que ocorrerem até lá
+    def _submit(self, pool, chunk, progress):
+        return chunk, self._hash(pool, chunk), Progress(**asdict(progress)), self._race_skipped
+
+    def _write(self, chunk, hashed, snapshot, race_skipped, progress):
+        hashes = [value for part in hashed for value in (part if isinstance(part, list) else part.result())]
+        try:
+            created = self._insert(chunk, hashes)
+        except IntegrityError:
+            # CPF criado por outro processo depois da carga do conjunto: descarta e grava o restante
+            taken = set(models.CustomUser.objects.filter(cpf__in=[row['cpf'] for row in chunk]).values_list('cpf', flat=True))
+            kept = [(row, value) for row, value in zip(chunk, hashes) if row['cpf'] not in taken]
+            created = self._insert([row for row, _ in kept], [value for _, value in kept])
+            progress.skipped += len(chunk) - len(kept)
+            self._race_skipped += len(chunk) - len(kept)
+
+        progress.created += created
+        snapshot.created = progress.created
+        # descartes das gravações feitas depois da cópia do progresso, inclusive desta
+        snapshot.skipped += self._race_skipped - race_skipped
+        if self.checkpoint:
+            self.checkpoint.save(snapshot)
+        return {'event': 'progress', **asdict(snapshot)}
+
+    @transaction.atomic
+    def _insert(self, chunk, hashes):
+        users = models.CustomUser.objects.bulk_create([
+            models.CustomUser(cpf=row['cpf'], password=password) for row, password in zip(chunk, hashes)
+        ])
+        for role, (model, _) in ROLES.items():
+            profiles = [model(user_id=user.id, **row['profile']) for row, user in zip(chunk, users) if row['role'] == role]
+            if profiles:
+                model.objects.bulk_create(profiles)
+                if role == 'transporter':
+                    # bulk_create não dispara o post_save que registra o transportador na escolha automática
+                    transaction.on_commit(dispatcher.invalidate)
+        return len(users)
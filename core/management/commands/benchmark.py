@@ -0,0 +1,145 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p95/p99), requisições por segundo e consultas por requisição '
+        'repetindo as chamadas da coleção do Insomnia sobre dados sintéticos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collection', default=str(Path(settings.BASE_DIR) / 'Insomnia_2024-03-21.json'))
+        parser.add_argument(
+            '--url',
+            help='Servidor em execução (ex.: http://127.0.0.1:8000/api/v1/); as consultas vêm do header '
+                 'Server-Timing. Sem ele, as requisições rodam no próprio processo, em um banco temporário.',
+        )
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help='Confirma que, com --url, os dados sintéticos podem ser gravados no banco configurado.',
+        )
+        parser.add_argument('--requests', type=int, default=1000, help='Requisições medidas.')
+        parser.add_argument('--warmup', type=int, default=50, help='Requisições iniciais descartadas.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--weights', default='', help='Pesos dos cenários, ex.: product_list=10,order_list=5')
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--transporters', type=int, default=10)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--orders-per-client', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos sorteios.')
+        parser.add_argument('--output', help='Arquivo JSON do resultado (padrão: benchmarks/<data>-<commit>.json).')
+        parser.add_argument('--compare', help='Resultado JSON anterior para comparar.')
+
+    def handle(self, *args, **options):
+        weights = self._parse_weights(options['weights'])
+        try:
+            templates = benchmark.build_templates(benchmark.load_collection(options['collection']))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Não foi possível ler a coleção: {exc}')
+
+        if options['url']:
+            # o servidor usa o banco configurado: os dados sintéticos ficam gravados nele
+            if not options['allow_writes']:
+                raise CommandError(
+                    f"Com --url os dados sintéticos são gravados em {settings.DATABASES['default']['NAME']}. "
+                    'Use um banco descartável e confirme com --allow-writes.'
+                )
+            result = self._benchmark(benchmark.HttpTransport(options['url']), templates, weights, options)
+        else:
+            with benchmark.test_databases():
+                result = self._benchmark(benchmark.InProcessTransport(), templates, weights, options)
+
+        self._print(result)
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / (
+            f"{timezone.now():%Y%m%d-%H%M%S}-{result['revision'] or 'unknown'}.json"
+        ))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Resultado salvo em {output}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self._print_comparison(json.load(file), result)
+
+    def _parse_weights(self, value):
+        weights = dict(benchmark.DEFAULT_WEIGHTS)
+        for part in filter(None, (part.strip() for part in value.split(','))):
+            name, _, weight = part.partition('=')
+            if name not in weights:
+                raise CommandError(f'Cenário desconhecido: {name}. Use: {", ".join(weights)}.')
+            try:
+                weights[name] = int(weight)
+            except ValueError:
+                raise CommandError(f'Peso inválido para {name}: {weight}')
+        if not any(weights.values()):
+            raise CommandError('Informe ao menos um cenário com peso maior que zero.')
+        return weights
+
+    def _benchmark(self, transport, templates, weights, options):
+        self.stdout.write('Gerando dados sintéticos...')
+        dataset = benchmark.seed(
+            clients=options['clients'],
+            transporters=options['transporters'],
+            products=options['products'],
+            orders_per_client=options['orders_per_client'],
+            random_seed=options['seed'],
+        )
+        factory = benchmark.RequestFactory(templates, dataset)
+
+        self.stdout.write(f"Executando {options['requests']} requisições com concorrência {options['concurrency']}...")
+        samples, duration = benchmark.run(
+            transport, factory, weights,
+            total_requests=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+            random_seed=options['seed'],
+        )
+        return {
+            'revision': benchmark.git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'mode': 'http' if options['url'] else 'in-process',
+            'url': options['url'],
+            'database_profile': getattr(settings, 'DATABASE_PROFILE', None),
+            'concurrency': options['concurrency'],
+            'weights': weights,
+            'dataset': {
+                'clients': options['clients'],
+                'transporters': options['transporters'],
+                'products': options['products'],
+                'orders_per_client': options['orders_per_client'],
+            },
+            'duration_s': round(duration, 3),
+            **benchmark.summarize(samples, duration),
+        }
+
+    def _print(self, result):
+        header = f"{'cenário':<24}{'req':>7}{'erros':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'consultas':>11}"
+        self.stdout.write(header)
+        rows = list(result['scenarios'].items()) + [('total', result['overall'])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<24}{stats['requests']:>7}{stats['errors']:>7}{_fmt(stats['rps']):>9}"
+                f"{_fmt(stats['p50_ms']):>9}{_fmt(stats['p95_ms']):>9}{_fmt(stats['p99_ms']):>9}"
+                f"{_fmt(stats['queries_per_request']):>11}"
+            )
+
+    def _print_comparison(self, previous, current):
+        self.stdout.write(f"\nComparação com {previous.get('revision')} (p95 ms / req/s):")
+        rows = [(name, previous['scenarios'].get(name), stats) for name, stats in current['scenarios'].items()]
+        rows.append(('total', previous['overall'], current['overall']))
+        for name, before, after in rows:
+            if not before:
+                continue
+            self.stdout.write(
+                f"{name:<24}{_fmt(before['p95_ms']):>9} -> {_fmt(after['p95_ms']):<9}"
+                f"{_fmt(before['rps']):>9} -> {_fmt(after['rps'])}"
+            )
+
+
+def _fmt(value):
+    return '-' if value is None else f'{value:.1f}'
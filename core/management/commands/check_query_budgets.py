@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import benchmark, budget_check
+
+
+class Command(BaseCommand):
+    help = (
+        'Chama todas as rotas do router de core/urls.py em um banco temporário com poucos e com muitos '
+        'registros e falha se alguma ação passar do orçamento de consultas ou fizer mais consultas com mais dados.'
+    )
+
+    def handle(self, *args, **options):
+        with benchmark.test_databases():
+            rows, failures = budget_check.run()
+
+        self.stdout.write(f"{'rota':<44}{'orçamento':>10}{'poucos':>8}{'muitos':>8}")
+        for small, large in rows:
+            budget = '-' if small.budget is None else small.budget
+            self.stdout.write(f'{small.name:<44}{budget:>10}{small.queries:>8}{large.queries:>8}')
+
+        if failures:
+            raise CommandError('\n'.join(['Orçamentos de consultas violados:'] + failures))
+        self.stdout.write(self.style.SUCCESS(f'{len(rows)} rotas dentro do orçamento.'))
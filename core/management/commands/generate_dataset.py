@@ -0,0 +1,62 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from core import dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera uma massa de dados sintética e determinística (usuários, clientes com endereços brasileiros, '
+        'transportadores, produtos e pedidos com itens ao longo de anos) no banco configurado, '
+        'com inserts diretos em lote.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--transporters', type=int, default=50)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--max-items', type=int, default=5, help='Máximo de produtos por pedido.')
+        parser.add_argument('--years', type=float, default=3, help='Período das datas de entrega, até --until.')
+        parser.add_argument('--until', type=date.fromisoformat, default=dataset.UNTIL,
+                            help=f'Última data de entrega, AAAA-MM-DD (padrão: {dataset.UNTIL}).')
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos sorteios; também define os CPFs gerados.')
+        parser.add_argument('--batch-size', type=int, default=dataset.BATCH_SIZE, help='Linhas por executemany.')
+        parser.add_argument('--password', default=dataset.PASSWORD, help='Senha de todos os usuários gerados.')
+
+    def handle(self, *args, **options):
+        generator = dataset.Generator(
+            clients=options['clients'],
+            transporters=options['transporters'],
+            products=options['products'],
+            orders=options['orders'],
+            max_items=options['max_items'],
+            years=options['years'],
+            seed=options['seed'],
+            until=options['until'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+        )
+        self.stdout.write(self.style.WARNING('Os dados sintéticos serão gravados no banco configurado.'))
+        try:
+            result = generator.run(progress=self._progress)
+        except ValueError as error:
+            raise CommandError(error)
+        except IntegrityError as error:
+            raise CommandError(f'{error}. Os CPFs da semente {options["seed"]} já existem; use outra --seed.')
+
+        self.stdout.write('\n')
+        for name, count in result.rows.items():
+            self.stdout.write(f'{name:<30}{count:>12}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.total} linhas em {result.seconds:.1f}s ({result.total / max(result.seconds, 1e-9):,.0f} linhas/s).'
+        ))
+
+    # uma linha por tabela, reescrita a cada lote
+    def _progress(self, name, count):
+        if name != getattr(self, '_current', None):
+            if hasattr(self, '_current'):
+                self.stdout.write('')
+            self._current = name
+        self.stdout.write(f'\r{name}: {count}', ending='')
+        self.stdout.flush()
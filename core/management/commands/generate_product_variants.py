@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core import models
+from core.images import process_product_photo
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes (thumbnail, medium, full em WebP e JPEG) das fotos de produtos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Processa apenas produtos sem variantes.')
+
+    def handle(self, *args, **options):
+        products = models.Product.objects.exclude(photo='').exclude(photo__isnull=True)
+        if options['missing']:
+            products = products.filter(photo_variants={})
+
+        count = 0
+        for product_id, name in products.values_list('id', 'photo').iterator():
+            process_product_photo(product_id, name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'{count} fotos processadas.'))
@@ -0,0 +1,46 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core import imports
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa usuários com perfil de cliente ou transportador de um arquivo CSV ou JSONL, em lotes, '
+        'com o hash das senhas em paralelo; uma execução interrompida continua do último lote gravado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo CSV (com cabeçalho) ou JSONL.')
+        parser.add_argument('--input', choices=imports.FORMATS, help='Formato do arquivo (padrão: pela extensão).')
+        parser.add_argument('--role', choices=list(imports.ROLES), help='Papel das linhas sem a coluna "role".')
+        parser.add_argument('--chunk-size', type=int, help='Usuários por transação (padrão: USER_IMPORT_CHUNK_SIZE).')
+        parser.add_argument('--workers', type=int, help='Processos para o hash das senhas (padrão: número de CPUs).')
+        parser.add_argument('--checkpoint', help='Arquivo de progresso (padrão: <arquivo>.checkpoint.json).')
+        parser.add_argument('--restart', action='store_true', help='Ignora o progresso salvo e começa do início.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            source = imports.fingerprint(path)
+        except OSError as error:
+            raise CommandError(error)
+        checkpoint = imports.Checkpoint(options['checkpoint'] or f'{path}.checkpoint.json', source)
+        if options['restart']:
+            checkpoint.clear()
+
+        importer = imports.UserImporter(
+            role=options['role'], chunk_size=options['chunk_size'], workers=options['workers'], checkpoint=checkpoint,
+        )
+        input_format = options['input'] or imports.detect_format(path)
+        with open(path, 'rb') as file:
+            for event in importer.run(imports.read_records(file, input_format)):
+                if event['event'] == 'error':
+                    self.stderr.write(f"linha {event['line']}: {json.dumps(event['errors'], ensure_ascii=False)}")
+                elif event['event'] == 'resume':
+                    self.stdout.write(f"Continuando após {event['position']} linhas ({event['created']} usuários já criados).")
+                elif event['event'] == 'progress':
+                    self.stdout.write(f"{event['position']} linhas lidas, {event['created']} usuários criados.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{event['created']} usuários criados, {event['skipped']} CPFs já existentes, {event['invalid']} linhas inválidas."
+        ))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.events import purge_events
+
+
+class Command(BaseCommand):
+    help = 'Apaga o histórico de eventos de pedidos mais antigo que o período de retenção.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Dias mantidos (padrão: ORDER_EVENTS_RETENTION_DAYS).')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'ORDER_EVENTS_RETENTION_DAYS', 30)
+        if days < 0:
+            raise CommandError('Informe um número de dias maior ou igual a zero.')
+        deleted = purge_events(timezone.now() - timedelta(days=days))
+        self.stdout.write(self.style.SUCCESS(f'{deleted} eventos apagados.'))
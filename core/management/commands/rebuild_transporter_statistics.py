@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.statistics import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os totais mensais de entregas por transportador a partir dos pedidos.'
+
+    def handle(self, *args, **options):
+        months = rebuild_statistics()
+        self.stdout.write(self.style.SUCCESS(f'{months} meses recalculados.'))
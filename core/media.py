@@ -0,0 +1,127 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# nomes com hash do conteúdo (ex.: variantes geradas em core.images) nunca mudam
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}(\.[^/.]+)+$')
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+# entrega os arquivos de MEDIA_ROOT com cache HTTP, GET condicional e requisições parciais
+def serve(request, path):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404
+
+    etag = quote_etag(f'{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}')
+    last_modified = int(file_stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, fullpath, file_stat.st_size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = _cache_control(path)
+    return response
+
+
+def _file_response(request, path, fullpath, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    backend = getattr(settings, 'MEDIA_SERVE_BACKEND', 'python')
+
+    # o servidor web da frente envia o arquivo (e trata Range) sem ocupar o worker
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(path)
+        return response
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        return response
+
+    byte_range = _requested_range(request, size, etag, last_modified)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        # arquivo inteiro: o servidor WSGI pode usar wsgi.file_wrapper / os.sendfile
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(fullpath, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+# interpreta um único intervalo "bytes=início-fim"; outros formatos recebem o arquivo inteiro
+def _requested_range(request, size, etag, last_modified):
+    header = request.META.get('HTTP_RANGE', '').strip()
+    match = RANGE_HEADER.match(header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+
+    # If-Range: só atende o intervalo se o arquivo não mudou
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            return 'unsatisfiable'
+    else:
+        # "bytes=-N": os últimos N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        start = max(size - length, 0)
+        end = size - 1
+    return start, end
+
+
+def _read_range(fullpath, start, end):
+    with open(fullpath, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _cache_control(path):
+    if HASHED_NAME.search(path):
+        return 'public, max-age=31536000, immutable'
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
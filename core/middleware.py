@@ -0,0 +1,101 @@
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from core import budgets, performance
+
+
+# mede cada requisição (consultas, fases, tamanho), devolve Server-Timing e amostra no ring buffer
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERFORMANCE_SERVER_TIMING', True)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timing, token = performance.start()
+        try:
+            # só as conexões desta thread: as consultas da requisição síncrona passam por elas
+            with ExitStack() as stack:
+                self._wrap_connections(stack, timing)
+                response = self.get_response(request)
+        finally:
+            performance.finish(token)
+        self._finish(request, response, timing)
+        return response
+
+    # no ASGI, views síncronas e o ORM das assíncronas rodam via sync_to_async na thread da requisição
+    # (thread_sensitive); o wrapper é instalado e removido nas conexões dessa mesma thread
+    async def __acall__(self, request):
+        timing, token = performance.start()
+        try:
+            stack = ExitStack()
+            await sync_to_async(self._wrap_connections)(stack, timing)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            performance.finish(token)
+        self._finish(request, response, timing)
+        return response
+
+    @staticmethod
+    def _wrap_connections(stack, timing):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timing.query_wrapper))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._performance_view_started = time.perf_counter()
+
+    # a renderização do DRF acontece depois deste hook, e o callback roda ao final dela
+    def process_template_response(self, request, response):
+        request._performance_view_finished = time.perf_counter()
+        timing = performance.current()
+        if timing is not None:
+            started = request._performance_view_finished
+            response.add_post_render_callback(lambda rendered: timing.add('render', time.perf_counter() - started))
+        return response
+
+    def _finish(self, request, response, timing):
+        now = time.perf_counter()
+        total = now - timing.started
+        view_started = getattr(request, '_performance_view_started', None)
+        if view_started is not None:
+            timing.add('view', getattr(request, '_performance_view_finished', now) - view_started)
+
+        size = None if response.streaming else len(response.content)
+        if self.server_timing:
+            metrics = [
+                f'{name};dur={seconds * 1000:.1f}' for name, seconds in timing.phases.items() if name != 'db'
+            ]
+            if timing.queries:
+                metrics.append(f'db;dur={timing.phases["db"] * 1000:.1f};desc="{timing.queries} queries"')
+            metrics.append(f'total;dur={total * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(metrics)
+
+        # consultas além do orçamento declarado no viewset (core.budgets)
+        budgets.check(request.resolver_match, request.method, timing.queries)
+
+        total_ms = total * 1000
+        if performance.should_sample(total_ms):
+            match = request.resolver_match
+            performance.samples.append({
+                'time': time.time(),
+                'method': request.method,
+                'route': (match.view_name or match.route) if match else '<unresolved>',
+                'status': response.status_code,
+                'total_ms': total_ms,
+                'db_ms': timing.phases.get('db', 0.0) * 1000,
+                'queries': timing.queries,
+                'size': size,
+                'phases': {name: seconds * 1000 for name, seconds in timing.phases.items()},
+            })
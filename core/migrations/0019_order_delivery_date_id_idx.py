@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_alter_order_delivery_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_date', 'id'], name='order_delivery_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_order_delivery_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransporterMonthlyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('deliveries', models.PositiveIntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transporter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_statistics', to='core.transporter')),
+            ],
+            options={
+                'verbose_name': 'Transporter monthly statistics',
+                'verbose_name_plural': 'Transporter monthly statistics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='transportermonthlystatistics',
+            constraint=models.UniqueConstraint(fields=('transporter', 'month'), name='unique_transporter_month_statistics'),
+        ),
+    ]
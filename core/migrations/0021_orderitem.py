@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_transportermonthlystatistics'),
+    ]
+
+    operations = [
+        # a tabela core_order_products já existe (criada pelo ManyToManyField);
+        # só o estado passa a conhecer o modelo intermediário
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='OrderItem',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False)),
+                        ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.order')),
+                        ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+                    ],
+                    options={
+                        'verbose_name': 'Order item',
+                        'verbose_name_plural': 'Order items',
+                        'db_table': 'core_order_products',
+                        'unique_together': {('order', 'product')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='order',
+                    name='products',
+                    field=models.ManyToManyField(through='core.OrderItem', to='core.product'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
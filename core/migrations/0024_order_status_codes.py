@@ -0,0 +1,67 @@
+from django.db import migrations, models
+
+OUT_FOR_DELIVERY, DELIVERED, CANCELED = 1, 2, 3
+
+LABELS = {
+    OUT_FOR_DELIVERY: "Seu pedido saiu para entrega e está a caminho do seu endereço",
+    DELIVERED: "Pedido entregue",
+    CANCELED: "Pedido cancelado",
+}
+
+
+# converte o texto livre antigo em código; qualquer texto desconhecido vira "saiu para entrega"
+def status_text_to_code(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    codes = {label.casefold(): code for code, label in LABELS.items()}
+    for status in Order.objects.values_list('status', flat=True).distinct():
+        code = codes.get((status or '').strip().casefold(), OUT_FOR_DELIVERY)
+        Order.objects.filter(status=status).update(status_code=code)
+
+
+def status_code_to_text(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    for code, label in LABELS.items():
+        Order.objects.filter(status_code=code).update(status=label)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_product_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=OUT_FOR_DELIVERY),
+        ),
+        migrations.RunPython(status_text_to_code, status_code_to_text),
+        migrations.RemoveField(
+            model_name='order',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Seu pedido saiu para entrega e está a caminho do seu endereço'), (2, 'Pedido entregue'), (3, 'Pedido cancelado')], default=1),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['transporter', 'status'], name='order_transporter_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', 'status'], name='order_client_status_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_order_status_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.IntegerField()),
+                ('transporter_id', models.IntegerField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Seu pedido saiu para entrega e está a caminho do seu endereço'), (2, 'Pedido entregue'), (3, 'Pedido cancelado')])),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='core.order')),
+            ],
+            options={
+                'verbose_name': 'Order event',
+                'verbose_name_plural': 'Order events',
+                'indexes': [models.Index(fields=['client_id', 'id'], name='order_event_client_idx'), models.Index(fields=['transporter_id', 'id'], name='order_event_transporter_idx'), models.Index(fields=['created_at'], name='order_event_created_at_idx')],
+            },
+        ),
+    ]
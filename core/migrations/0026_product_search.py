@@ -0,0 +1,80 @@
+from django.db import migrations
+
+# colunas de core_product indexadas na busca; novas colunas de texto entram aqui e no FTS_COLUMNS de core.search
+COLUMNS = ('name',)
+
+# SQLite: tabela FTS5 de conteúdo externo (o texto continua só em core_product), sem acentos
+# ("maçã" encontra "maca") e com índices de prefixo para o autocompletar
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE core_product_fts USING fts5(
+        {', '.join(COLUMNS)}, content='core_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    # os gatilhos mantêm o índice em dia com qualquer escrita, inclusive bulk_create e update()
+    f"""CREATE TRIGGER core_product_fts_insert AFTER INSERT ON core_product BEGIN
+        INSERT INTO core_product_fts(rowid, {', '.join(COLUMNS)}) VALUES (new.id, {', '.join(f'new.{c}' for c in COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER core_product_fts_delete AFTER DELETE ON core_product BEGIN
+        INSERT INTO core_product_fts(core_product_fts, rowid, {', '.join(COLUMNS)})
+        VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER core_product_fts_update AFTER UPDATE OF {', '.join(COLUMNS)} ON core_product BEGIN
+        INSERT INTO core_product_fts(core_product_fts, rowid, {', '.join(COLUMNS)})
+        VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in COLUMNS)});
+        INSERT INTO core_product_fts(rowid, {', '.join(COLUMNS)}) VALUES (new.id, {', '.join(f'new.{c}' for c in COLUMNS)});
+    END""",
+    # indexa os produtos já cadastrados
+    "INSERT INTO core_product_fts(core_product_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS core_product_fts_update',
+    'DROP TRIGGER IF EXISTS core_product_fts_delete',
+    'DROP TRIGGER IF EXISTS core_product_fts_insert',
+    'DROP TABLE IF EXISTS core_product_fts',
+]
+
+# PostgreSQL: índice de trigramas, usado pelo ILIKE da busca alternativa
+POSTGRESQL_FORWARD = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f'CREATE INDEX IF NOT EXISTS core_product_{column}_trgm ON core_product USING gin ({column} gin_trgm_ops)'
+    for column in COLUMNS
+]
+POSTGRESQL_BACKWARD = [f'DROP INDEX IF EXISTS core_product_{column}_trgm' for column in COLUMNS]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def _statements(schema_editor, forward):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        # sem FTS5 compilado, core.search usa a busca alternativa
+        if not _sqlite_has_fts5(connection):
+            return []
+        return SQLITE_FORWARD if forward else SQLITE_BACKWARD
+    if connection.vendor == 'postgresql':
+        return POSTGRESQL_FORWARD if forward else POSTGRESQL_BACKWARD
+    return []
+
+
+def create_search_index(apps, schema_editor):
+    for statement in _statements(schema_editor, forward=True):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in _statements(schema_editor, forward=False):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_orderevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
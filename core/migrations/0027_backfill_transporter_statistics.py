@@ -0,0 +1,43 @@
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+DELIVERED = 2
+
+
+# preenche os totais mensais com os pedidos entregues antes da criação da tabela; mesma regra de
+# core.statistics.rebuild_statistics (mês da mudança para entregue; sem ela, o da data do pedido)
+def backfill_statistics(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    TransporterMonthlyStatistics = apps.get_model('core', 'TransporterMonthlyStatistics')
+    rows = (
+        Order.objects
+        .filter(status=DELIVERED)
+        .annotate(month=Coalesce(TruncMonth('status_changed_at', output_field=DateField()), TruncMonth('delivery_date')))
+        .filter(month__isnull=False)
+        .values('transporter_id', 'month')
+        .annotate(deliveries=Count('id'), total_value=Sum('total_amount'))
+        .order_by()
+    )
+    totals = {(row['transporter_id'], row['month']): (row['deliveries'], row['total_value'] or Decimal('0')) for row in rows}
+
+    TransporterMonthlyStatistics.objects.all().delete()
+    TransporterMonthlyStatistics.objects.bulk_create(
+        [
+            TransporterMonthlyStatistics(transporter_id=transporter_id, month=month, deliveries=deliveries, total_value=value)
+            for (transporter_id, month), (deliveries, value) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.2 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_backfill_transporter_statistics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', 'delivery_date', 'id'], name='order_client_delivery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['transporter', 'delivery_date', 'id'], name='order_transporter_delivery_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 
 
 class CustomUserManager(BaseUserManager):
@@ -34,6 +36,26 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         return self.cpf
 
 
+# guarda os valores carregados do banco para detectar mudanças ao salvar
+class LoadedValuesMixin:
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.tracked_fields
+        }
+        return instance
+
+    def loaded_value(self, name):
+        return getattr(self, '_loaded_values', {}).get(name)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {name: getattr(self, name) for name in self.tracked_fields}
+
+
 class Client(models.Model):
     user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, blank=True, null=True)
     name = models.CharField(max_length=40)
@@ -68,27 +90,142 @@ class Transporter(models.Model):
         return f'{self.client}, {self.cnh}'
 
 
-class Order(models.Model):
+class OrderStatus(models.IntegerChoices):
+    OUT_FOR_DELIVERY = 1, "Seu pedido saiu para entrega e está a caminho do seu endereço"
+    DELIVERED = 2, "Pedido entregue"
+    CANCELED = 3, "Pedido cancelado"
+
+
+class Order(LoadedValuesMixin, models.Model):
+    Status = OrderStatus
+    # pedidos ainda em andamento (contam na carga do transportador)
+    OPEN_STATUSES = frozenset({OrderStatus.OUT_FOR_DELIVERY})
+    # mudanças de status permitidas
+    STATUS_TRANSITIONS = {
+        OrderStatus.OUT_FOR_DELIVERY: frozenset({OrderStatus.DELIVERED, OrderStatus.CANCELED}),
+        OrderStatus.DELIVERED: frozenset(),
+        OrderStatus.CANCELED: frozenset(),
+    }
+
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='orders', blank=True)
     transporter = models.ForeignKey(Transporter, on_delete=models.CASCADE, blank=True)
-    products = models.ManyToManyField('Product')
+    products = models.ManyToManyField('Product', through='OrderItem')
     delivery_date = models.DateField(auto_now_add=True, null=True, blank=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    status = models.CharField(max_length=50, null=True, blank=True)
+    status = models.PositiveSmallIntegerField(choices=OrderStatus.choices, default=OrderStatus.OUT_FOR_DELIVERY)
+    status_changed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
+        indexes = [
+            # usado pela paginação por chave das listagens de pedidos
+            models.Index(fields=['delivery_date', 'id'], name='order_delivery_date_id_idx'),
+            # as listagens de clientes e transportadores filtram pelo papel antes da ordenação
+            models.Index(fields=['client', 'delivery_date', 'id'], name='order_client_delivery_idx'),
+            models.Index(fields=['transporter', 'delivery_date', 'id'], name='order_transporter_delivery_idx'),
+            # filtros e agregações por status de cada transportador / cliente
+            models.Index(fields=['transporter', 'status'], name='order_transporter_status_idx'),
+            models.Index(fields=['client', 'status'], name='order_client_status_idx'),
+        ]
+
+    tracked_fields = ('transporter_id', 'status', 'total_amount', 'delivery_date', 'status_changed_at')
 
     def __str__(self):
         return f'{self.client}, {self.transporter}, {self.total_amount}'
 
+    @property
+    def is_open(self):
+        return self.status in self.OPEN_STATUSES
+
+    def can_transition_to(self, status):
+        current = self.loaded_value('status')
+        return current is None or current == status or status in self.STATUS_TRANSITIONS.get(current, ())
+
+    def clean(self):
+        super().clean()
+        if not self.can_transition_to(self.status):
+            raise ValidationError({'status': "Mudança de status não permitida."})
+
+    def save(self, *args, **kwargs):
+        # registra o momento da última mudança de status
+        if self._state.adding or self.status != self.loaded_value('status'):
+            self.status_changed_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'status' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'status_changed_at'}
+        super().save(*args, **kwargs)
+
+
+# produto de um pedido, com quantidade e preço unitário no momento da compra
+class OrderItem(models.Model):
+    # reaproveita a tabela criada para o antigo ManyToManyField de produtos
+    id = models.AutoField(primary_key=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey('Product', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_order_products'
+        verbose_name = 'Order item'
+        verbose_name_plural = 'Order items'
+        unique_together = [('order', 'product')]
+
+    def __str__(self):
+        return f'{self.order_id}, {self.product_id}, {self.quantity}'
+
+
+# histórico de mudanças de status dos pedidos; o id é o id do evento enviado por SSE
+class OrderEvent(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    # cópias do pedido no momento do evento, para filtrar por destinatário sem JOIN
+    client_id = models.IntegerField()
+    transporter_id = models.IntegerField()
+    status = models.PositiveSmallIntegerField(choices=OrderStatus.choices)
+    created_at = models.DateTimeField(default=timezone.now)
 
-class Product(models.Model):
+    class Meta:
+        verbose_name = 'Order event'
+        verbose_name_plural = 'Order events'
+        indexes = [
+            models.Index(fields=['client_id', 'id'], name='order_event_client_idx'),
+            models.Index(fields=['transporter_id', 'id'], name='order_event_transporter_idx'),
+            models.Index(fields=['created_at'], name='order_event_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id}, {self.status}, {self.created_at}'
+
+
+# totais mensais de entregas por transportador, mantidos a cada pedido entregue
+class TransporterMonthlyStatistics(models.Model):
+    transporter = models.ForeignKey(Transporter, on_delete=models.CASCADE, related_name='monthly_statistics')
+    month = models.DateField()
+    deliveries = models.PositiveIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Transporter monthly statistics'
+        verbose_name_plural = 'Transporter monthly statistics'
+        constraints = [
+            models.UniqueConstraint(fields=['transporter', 'month'], name='unique_transporter_month_statistics'),
+        ]
+
+    def __str__(self):
+        return f'{self.transporter_id}, {self.month:%Y-%m}, {self.deliveries}'
+
+
+class Product(LoadedValuesMixin, models.Model):
     name = models.CharField(max_length=100)
     value = models.DecimalField(max_digits=10, decimal_places=2)
     weight_kg = models.CharField(max_length=100)
     photo = models.ImageField(upload_to='client_photos/', null=True, blank=True)
+    # versões redimensionadas da foto: {variante: {formato: caminho no storage}}
+    photo_variants = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    tracked_fields = ('photo',)
 
     class Meta:
         verbose_name = 'Product'
@@ -97,6 +234,11 @@ class Product(models.Model):
     def __str__(self):
         return f'{self.name}, {self.value}'
 
+    @property
+    def photo_changed(self):
+        loaded = self.loaded_value('photo')
+        return (self.photo.name or '') != (getattr(loaded, 'name', loaded) or '')
+
 # Corrigir conflito de acesso reverso para grupos e permissões de usuário
 CustomUser._meta.get_field('groups').remote_field.related_name = 'user_groups'
 CustomUser._meta.get_field('user_permissions').remote_field.related_name = 'user_permissions_custom'
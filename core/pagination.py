@@ -0,0 +1,190 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# paginação por chave (keyset): cada página é buscada a partir da posição do último item
+# da página anterior, usando um índice, sem OFFSET e sem COUNT(*)
+class KeysetPagination(BasePagination):
+    # campos de ordenação; o último precisa ser único (normalmente o id)
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    @property
+    def page_size(self):
+        return settings.REST_FRAMEWORK.get('PAGE_SIZE') or 50
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [self._parse_ordering(item, queryset.model) for item in self.ordering]
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+        if cursor is not None:
+            queryset = queryset.filter(self._after(cursor['position'], before=reverse))
+
+        queryset = queryset.order_by(*self._order_by(reverse))
+
+        # busca um item a mais para saber se existe uma próxima página
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.first_position = self._position(results[0]) if results else None
+        self.last_position = self._position(results[-1]) if results else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return min(self.page_size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor opaco retornado em "next" ou "previous".',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Itens por página (máximo {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            # página vazia após um cursor: volta para o início
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        values = [None if value is None else force_str(field.get_prep_value(value))
+                  for (_, field, _), value in zip(self.fields, position)]
+        payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            raw_position = payload['p']
+            if len(raw_position) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) if value is not None else None
+                        for (_, field, _), value in zip(self.fields, raw_position)]
+            return {'position': position, 'reverse': bool(payload.get('r'))}
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _parse_ordering(item, model):
+        descending = item.startswith('-')
+        name = item.lstrip('-')
+        return name, model._meta.get_field(name), descending
+
+    def _order_by(self, reverse):
+        expressions = []
+        # valores nulos ficam sempre no fim da ordenação normal (e no início da invertida)
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        for name, _, descending in self.fields:
+            if descending != reverse:
+                expressions.append(F(name).desc(**nulls))
+            else:
+                expressions.append(F(name).asc(**nulls))
+        return expressions
+
+    def _after(self, position, before=False):
+        # monta a comparação lexicográfica (a, b) > (x, y) campo a campo, respeitando nulos no fim
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, field, descending), value in zip(self.fields, position):
+            condition |= equal & self._strict(name, field, descending, value, before)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _strict(name, field, descending, value, before):
+        lookup = 'lt' if descending != before else 'gt'
+        if not field.null:
+            return Q(**{f'{name}__{lookup}': value})
+        if before:
+            # antes de um nulo vem qualquer valor preenchido; antes de um valor, só valores
+            if value is None:
+                return Q(**{f'{name}__isnull': False})
+            return Q(**{f'{name}__{lookup}': value})
+        if value is None:
+            return Q(pk__in=[])
+        return Q(**{f'{name}__{lookup}': value}) | Q(**{f'{name}__isnull': True})
+
+    def _position(self, item):
+        if isinstance(item, dict):
+            return [item.get(name) for name, _, _ in self.fields]
+        return [getattr(item, field.attname) for _, field, _ in self.fields]
+
+
+# pedidos são listados dos mais recentes para os mais antigos
+class OrderKeysetPagination(KeysetPagination):
+    ordering = ('-delivery_date', '-id')
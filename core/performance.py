@@ -0,0 +1,138 @@
+import bisect
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+# limites (ms) das faixas dos histogramas por rota
+HISTOGRAM_BOUNDS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_current = ContextVar('performance_timing', default=None)
+
+
+# tempos de uma requisição; cada fase acumula a duração em segundos
+class Timing:
+    __slots__ = ('started', 'phases', 'queries', 'active')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        # fases em andamento (uma fase dentro dela mesma, como serializers aninhados, conta uma vez)
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    # wrapper de execute_wrapper: conta e cronometra as consultas
+    def query_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - start)
+
+
+def start():
+    timing = Timing()
+    return timing, _current.set(timing)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+# cronometra um trecho da requisição atual (não faz nada fora de uma requisição medida)
+@contextmanager
+def phase(name):
+    timing = _current.get()
+    if timing is None or name in timing.active:
+        yield
+        return
+    timing.active.add(name)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.active.discard(name)
+        timing.add(name, time.perf_counter() - start_time)
+
+
+# amostras das últimas requisições, em memória e por processo
+class RingBuffer:
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, sample):
+        # deque.append é atômico; o lock só protege a cópia feita em snapshot()
+        self._samples.append(sample)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._samples)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+samples = RingBuffer(getattr(settings, 'PERFORMANCE_BUFFER_SIZE', 5000))
+
+
+# grava todas as requisições lentas e uma fração das demais
+def should_sample(total_ms):
+    if total_ms >= getattr(settings, 'PERFORMANCE_SLOW_MS', 500):
+        return True
+    return random.random() < getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0.1)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+# resumo por rota: contagem, percentis, médias e histograma de latência
+def route_statistics(rows):
+    by_route = {}
+    for row in rows:
+        by_route.setdefault((row['method'], row['route']), []).append(row)
+
+    routes = []
+    for (method, route), route_rows in by_route.items():
+        totals = sorted(row['total_ms'] for row in route_rows)
+        histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for total in totals:
+            histogram[bisect.bisect_left(HISTOGRAM_BOUNDS, total)] += 1
+        count = len(route_rows)
+        routes.append({
+            'method': method,
+            'route': route,
+            'count': count,
+            'errors': sum(1 for row in route_rows if row['status'] >= 500),
+            'p50_ms': round(_percentile(totals, 0.50), 2),
+            'p95_ms': round(_percentile(totals, 0.95), 2),
+            'p99_ms': round(_percentile(totals, 0.99), 2),
+            'max_ms': round(totals[-1], 2),
+            'avg_db_ms': round(sum(row['db_ms'] for row in route_rows) / count, 2),
+            'avg_queries': round(sum(row['queries'] for row in route_rows) / count, 2),
+            'avg_size': _average(row['size'] for row in route_rows),
+            'histogram': {
+                label: value for label, value in zip(
+                    [f'<={bound}ms' for bound in HISTOGRAM_BOUNDS] + [f'>{HISTOGRAM_BOUNDS[-1]}ms'], histogram,
+                )
+            },
+        })
+    return sorted(routes, key=lambda route: route['p95_ms'], reverse=True)
+
+
+def _average(values):
+    values = [value for value in values if value is not None]
+    return round(sum(values) / len(values)) if values else None
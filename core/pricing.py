@@ -0,0 +1,32 @@
+from decimal import Decimal
+from core import models
+
+
+# busca o preço de todos os produtos informados com uma única consulta
+def load_prices(product_ids):
+    return dict(models.Product.objects.filter(id__in=set(product_ids)).values_list('id', 'value'))
+
+
+# junta a lista de produtos (quantidade 1 cada) e os itens com quantidade em {produto: quantidade}
+def merge_lines(products=None, items=None):
+    lines = {}
+    for product_id in products or ():
+        lines[product_id] = lines.get(product_id, 0) + 1
+    for item in items or ():
+        lines[item['product_id']] = lines.get(item['product_id'], 0) + item['quantity']
+    return lines
+
+
+# calcula o total do pedido; retorna também os produtos que não existem
+def price_lines(lines, prices):
+    missing = [product_id for product_id in lines if product_id not in prices]
+    total = sum((prices[product_id] * quantity for product_id, quantity in lines.items()
+                 if product_id in prices), Decimal('0.00'))
+    return total, missing
+
+
+def build_items(order_id, lines, prices):
+    return [
+        models.OrderItem(order_id=order_id, product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+        for product_id, quantity in lines.items()
+    ]
@@ -0,0 +1,30 @@
+from collections import namedtuple
+from core import models
+
+
+Role = namedtuple('Role', ('client_id', 'transporter_id'))
+
+NO_ROLE = Role(None, None)
+
+# atributo usado para guardar o papel já resolvido no próprio objeto do usuário
+_ROLE_ATTR = '_chaeso_role'
+
+
+# resolve, com uma única consulta, se o usuário é cliente e/ou transportador
+def resolve_role(user):
+    role = getattr(user, _ROLE_ATTR, None)
+    if role is not None:
+        return role
+
+    if not getattr(user, 'is_authenticated', False):
+        return NO_ROLE
+
+    row = (
+        models.CustomUser.objects
+        .filter(pk=user.pk)
+        .values_list('client__id', 'transporter__id')
+        .first()
+    )
+    role = Role(*row) if row else NO_ROLE
+    setattr(user, _ROLE_ATTR, role)
+    return role
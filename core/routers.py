@@ -0,0 +1,23 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'replica'
+
+
+# leituras vão para a conexão somente leitura; escritas e migrações, para a principal
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if READ_ALIAS not in connections.databases:
+            return None
+        # dentro de uma transação na principal, lê dela para enxergar as próprias escritas
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,246 @@
+import csv
+import hashlib
+import math
+import time
+from datetime import datetime, time as dt_time, timedelta
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from core import models
+
+CENTROIDS_FILE = Path(__file__).resolve().parent / 'data' / 'cep_centroids.csv'
+EARTH_RADIUS_KM = 6371.0
+# dentro da mesma região do arquivo de centroides, a diferença entre os setores de CEP (5 dígitos)
+# é usada como aproximação da distância: CEPs próximos ficam em ruas próximas
+CEP_SECTOR_KM = 0.01
+
+ADDRESS_FIELDS = ('cep', 'street', 'number', 'district', 'city', 'uf')
+
+
+def digits(cep):
+    return ''.join(char for char in cep or '' if char.isdigit())
+
+
+# {prefixo do CEP: (lat, lon)} lido uma vez por processo
+@lru_cache(maxsize=None)
+def load_centroids(path=None):
+    path = path or getattr(settings, 'ORDER_ROUTE_CEP_CENTROIDS', CENTROIDS_FILE)
+    with open(path, newline='', encoding='utf-8') as file:
+        rows = csv.DictReader(line for line in file if not line.startswith('#'))
+        return {row['prefix']: (float(row['lat']), float(row['lon'])) for row in rows}
+
+
+# (prefixo, (lat, lon)) do prefixo mais longo que casa com o CEP; None se nenhum casar
+def locate(cep, centroids):
+    cep = digits(cep)
+    for length in range(len(cep), 0, -1):
+        point = centroids.get(cep[:length])
+        if point is not None:
+            return cep[:length], point
+    return None
+
+
+def haversine(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+# parada da rota: pedidos do mesmo setor de CEP e bairro, entregues em sequência
+class Stop:
+    __slots__ = ('key', 'cep', 'district', 'city', 'uf', 'sector', 'location', 'orders')
+
+    def __init__(self, key, row, centroids):
+        self.key = key
+        self.cep = row['client__cep']
+        self.district = row['client__district']
+        self.city = row['client__city']
+        self.uf = row['client__uf']
+        self.sector = int(key[0]) if key[0] else None
+        self.location = locate(self.cep, centroids)
+        self.orders = []
+
+
+def group_stops(rows, centroids):
+    stops = {}
+    for row in rows:
+        key = (digits(row['client__cep'])[:5], (row['client__district'] or '').strip().casefold())
+        stop = stops.get(key)
+        if stop is None:
+            stop = stops[key] = Stop(key, row, centroids)
+        stop.orders.append(row)
+    for stop in stops.values():
+        stop.orders.sort(key=lambda row: ((row['client__street'] or '').casefold(), row['client__number'] or 0, row['id']))
+    return list(stops.values())
+
+
+# tabela de distâncias (km) entre as paradas, simétrica; o haversine é calculado uma vez por par de regiões
+def distance_table(stops):
+    between_regions = {}
+    size = len(stops)
+    table = [[0.0] * size for _ in range(size)]
+    for i, a in enumerate(stops):
+        prefix_a, point_a = a.location
+        row = table[i]
+        for j in range(i + 1, size):
+            b = stops[j]
+            prefix_b, point_b = b.location
+            if prefix_a == prefix_b:
+                distance = abs(a.sector - b.sector) * CEP_SECTOR_KM
+            else:
+                pair = (prefix_a, prefix_b) if prefix_a < prefix_b else (prefix_b, prefix_a)
+                distance = between_regions.get(pair)
+                if distance is None:
+                    distance = between_regions[pair] = haversine(point_a, point_b)
+            row[j] = table[j][i] = distance
+    return table
+
+
+def nearest_neighbour(table, start):
+    path = [start]
+    remaining = set(range(len(table))) - {start}
+    while remaining:
+        row = table[path[-1]]
+        nearest = min(remaining, key=row.__getitem__)
+        remaining.remove(nearest)
+        path.append(nearest)
+    return path
+
+
+# melhora o caminho aberto (sem volta ao início) invertendo trechos enquanto houver ganho;
+# o primeiro ponto fica fixo e o tempo é limitado por deadline
+def two_opt(path, table, deadline):
+    size = len(path)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, size - 1):
+            if time.perf_counter() > deadline:
+                return path
+            row_a = table[path[i - 1]]
+            b = path[i]
+            for j in range(i + 1, size):
+                c = path[j]
+                delta = row_a[c] - row_a[b]
+                if j + 1 < size:
+                    d = path[j + 1]
+                    delta += table[b][d] - table[c][d]
+                if delta < -1e-9:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    b = path[i]
+                    improved = True
+    return path
+
+
+# ordena as paradas: vizinho mais próximo a partir do ponto de saída (ou do menor CEP) e depois 2-opt;
+# paradas com CEP fora da tabela de centroides vão para o fim, em ordem de CEP
+def plan(stops, start_cep=None, centroids=None, optimize_seconds=None):
+    centroids = centroids if centroids is not None else load_centroids()
+    if optimize_seconds is None:
+        optimize_seconds = getattr(settings, 'ORDER_ROUTE_OPTIMIZE_SECONDS', 0.5)
+    located = sorted((stop for stop in stops if stop.location), key=lambda stop: stop.key)
+    unlocated = sorted((stop for stop in stops if not stop.location), key=lambda stop: stop.key)
+    if not located:
+        return [(stop, None) for stop in unlocated]
+
+    nodes = list(located)
+    origin = locate(start_cep, centroids) if start_cep else None
+    if origin:
+        depot = Stop((digits(start_cep)[:5], ''), dict.fromkeys(f'client__{field}' for field in ADDRESS_FIELDS), centroids)
+        depot.cep = start_cep
+        depot.location = origin
+        nodes.insert(0, depot)
+
+    table = distance_table(nodes)
+    path = nearest_neighbour(table, 0)
+    path = two_opt(path, table, time.perf_counter() + optimize_seconds)
+
+    route = []
+    for previous, index in zip([None] + path, path):
+        if origin and index == 0:
+            continue
+        route.append((nodes[index], table[previous][index] if previous is not None else 0.0))
+    return route + [(stop, None) for stop in unlocated]
+
+
+def _cache_key(transporter_id, day):
+    return f'order-route:{transporter_id}:{day.isoformat()}'
+
+
+def _seconds_until_tomorrow(now):
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), dt_time.min, tzinfo=now.tzinfo)
+    return max(1, int((tomorrow - now).total_seconds()))
+
+
+# pedidos em aberto do transportador com o endereço do cliente, em uma consulta
+def open_orders(transporter_id):
+    return list(
+        models.Order.objects
+        .filter(transporter_id=transporter_id, status__in=models.Order.OPEN_STATUSES)
+        .order_by('id')
+        .values('id', 'client_id', 'client__name', 'delivery_date', 'total_amount', 'status',
+                *(f'client__{field}' for field in ADDRESS_FIELDS))
+    )
+
+
+# identifica o conjunto de pedidos e endereços; se mudar, a rota do dia é recalculada
+def fingerprint(rows, start_cep):
+    digest = hashlib.sha256(repr(start_cep).encode())
+    for row in rows:
+        digest.update(repr((row['id'], row['status'], *(row[f'client__{field}'] for field in ADDRESS_FIELDS))).encode())
+    return digest.hexdigest()
+
+
+# rota do dia do transportador; fica em cache até o fim do dia enquanto os pedidos e endereços não mudarem
+def route_for(transporter_id):
+    now = timezone.localtime()
+    start_cep = getattr(settings, 'ORDER_ROUTE_START_CEP', None)
+    rows = open_orders(transporter_id)
+    key = _cache_key(transporter_id, now.date())
+    current = fingerprint(rows, start_cep)
+
+    cached = cache.get(key)
+    if cached is not None and cached['fingerprint'] == current:
+        return cached['route']
+
+    stops = plan(group_stops(rows, load_centroids()), start_cep=start_cep)
+    route = serialize(transporter_id, now, stops)
+    cache.set(key, {'fingerprint': current, 'route': route}, _seconds_until_tomorrow(now))
+    return route
+
+
+def serialize(transporter_id, now, stops):
+    total = sum(distance for _, distance in stops if distance)
+    return {
+        'transporter': transporter_id,
+        'date': now.date().isoformat(),
+        'generated_at': now.isoformat(),
+        'total_km': round(total, 2),
+        'stops': [
+            {
+                'sequence': sequence,
+                'cep': stop.cep,
+                'district': stop.district,
+                'city': stop.city,
+                'uf': stop.uf,
+                'region': stop.location[0] if stop.location else None,
+                'distance_km': round(distance, 2) if distance is not None else None,
+                'orders': [
+                    {
+                        'id': row['id'],
+                        'client': row['client_id'],
+                        'client_name': row['client__name'],
+                        'street': row['client__street'],
+                        'number': row['client__number'],
+                        'status': row['status'],
+                        'delivery_date': row['delivery_date'].isoformat() if row['delivery_date'] else None,
+                        'total_amount': str(row['total_amount']) if row['total_amount'] is not None else None,
+                    }
+                    for row in stop.orders
+                ],
+            }
+            for sequence, (stop, distance) in enumerate(stops, start=1)
+        ],
+    }
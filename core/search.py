@@ -0,0 +1,76 @@
+import re
+from django.db import connections, router
+from django.db.models import Q
+from core import models
+
+# colunas indexadas (migração 0026_product_search)
+FTS_TABLE = 'core_product_fts'
+FTS_COLUMNS = ('name',)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# termos considerados de uma busca; o restante é ignorado
+MAX_TERMS = 8
+# termos mais curtos que isso não são buscados como prefixo (a tabela tem índices de prefixo de 2 e 3 letras)
+MIN_PREFIX = 2
+
+_WORD = re.compile(r'\w+')
+_fts_available = {}
+
+
+def terms(query):
+    return _WORD.findall(query.casefold())[:MAX_TERMS]
+
+
+# "maca ver" -> "maca"* "ver"*: todos os termos, cada um como prefixo (autocompletar)
+def fts_query(words):
+    return ' '.join(f'"{word}"*' if len(word) >= MIN_PREFIX else f'"{word}"' for word in words)
+
+
+def has_fts(alias):
+    if alias not in _fts_available:
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            _fts_available[alias] = False
+        else:
+            # direto na conexão sqlite3, uma vez por processo: não conta como consulta da requisição
+            connection.ensure_connection()
+            row = connection.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [FTS_TABLE],
+            ).fetchone()
+            _fts_available[alias] = row is not None
+    return _fts_available[alias]
+
+
+# produtos que contêm todos os termos (como prefixo), dos mais relevantes para os menos;
+# FTS5 com bm25 no SQLite, ILIKE sobre o índice de trigramas nos demais bancos
+def search_products(query, limit=DEFAULT_LIMIT):
+    words = terms(query)
+    if not words:
+        return []
+    alias = router.db_for_read(models.Product)
+    if has_fts(alias):
+        return list(models.Product.objects.using(alias).raw(
+            f'SELECT core_product.* FROM ('
+            # o bm25 é calculado para todas as correspondências e só os mais relevantes entram no join
+            f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank, rowid LIMIT %s'
+            f') AS matches JOIN core_product ON core_product.id = matches.rowid '
+            f'ORDER BY matches.rank, core_product.id',
+            [fts_query(words), limit],
+        ))
+    return list(_fallback(alias, words)[:limit])
+
+
+# diferente do FTS5 (remove_diacritics), o icontains compara os acentos; ignorá-los exigiria a
+# extensão unaccent no PostgreSQL, que a migração 0026 não instala
+def _fallback(alias, words):
+    queryset = models.Product.objects.using(alias)
+    for word in words:
+        condition = Q()
+        for column in FTS_COLUMNS:
+            condition |= Q(**{f'{column}__icontains': word})
+        queryset = queryset.filter(condition)
+    if connections[alias].vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        return queryset.annotate(similarity=TrigramSimilarity(FTS_COLUMNS[0], ' '.join(words))).order_by('-similarity', 'id')
+    return queryset.order_by('name', 'id')
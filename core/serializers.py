@@ -1,8 +1,25 @@
 from rest_framework import serializers
-from .models import CustomUser, Client, Transporter, Order, Product
+from rest_framework.utils import model_meta
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from . import performance
+from .models import CustomUser, Client, Transporter, Order, OrderItem, Product
+from .dispatch import dispatcher
+from .images import variant_urls
+from .pricing import build_items, load_prices, merge_lines, price_lines
+from .roles import resolve_role
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+# cronometra a serialização (to_representation) como uma fase da requisição (Server-Timing)
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with performance.phase('serialize'):
+            return super().to_representation(instance)
+
+
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
 
     class Meta:
@@ -25,7 +42,66 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return instance
     
 
-class ClientSerializer(serializers.ModelSerializer):
+# inclui o papel do usuário nas claims, para que a autenticação JWT não precise consultar o banco
+class ChaesoTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        role = resolve_role(user)
+        token['client_id'] = role.client_id
+        token['transporter_id'] = role.transporter_id
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        # copiado para os access tokens gerados a partir deste refresh token
+        token['rjti'] = token['jti']
+        return token
+
+
+# ?fields= limita os campos da resposta e ?expand= troca campos pela versão completa
+# (repassados pelo core.flat.FlatReadMixin nas leituras); os campos expandidos sempre são incluídos
+class SparseFieldsMixin:
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = expand or ()
+        unknown = [name for name in expand if name not in self.expandable_fields]
+        if unknown:
+            raise serializers.ValidationError({'expand': [f"Não é possível expandir \"{name}\"." for name in unknown]})
+        for name in expand:
+            self.fields[name] = self.build_expanded_field(name)
+
+        if fields:
+            unknown = [name for name in fields if name not in self.fields]
+            if unknown:
+                raise serializers.ValidationError({'fields': [f"Campo desconhecido: \"{name}\"." for name in unknown]})
+            keep = set(fields) | set(expand)
+            for name in [name for name in self.fields if name not in keep]:
+                del self.fields[name]
+
+    # padrão: o relacionamento do modelo com o mesmo nome, como serializer aninhado com todos os campos
+    def build_expanded_field(self, name):
+        relation = model_meta.get_field_info(self.Meta.model).relations.get(name)
+        if relation is None:
+            raise ImproperlyConfigured(f'{type(self).__name__}.expandable_fields: "{name}" não é um relacionamento do modelo.')
+        field_class, field_kwargs = self.build_nested_field(name, relation, 1)
+        return field_class(**field_kwargs)
+
+    # consultas extras para serializar os campos expandidos a partir de instâncias: o padrão
+    # acompanha o build_expanded_field (select_related nos FKs, prefetch nos demais)
+    @classmethod
+    def expand_queryset(cls, queryset, expand):
+        relations = model_meta.get_field_info(cls.Meta.model).relations
+        single = [name for name in expand if name in relations and not relations[name].to_many and not relations[name].reverse]
+        many = [name for name in expand if name in relations and name not in single]
+        if single:
+            queryset = queryset.select_related(*single)
+        if many:
+            queryset = queryset.prefetch_related(*many)
+        return queryset
+
+
+class ClientSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(many=False, read_only=True)
 
     class Meta:
@@ -36,7 +112,7 @@ class ClientSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
 
         # verifica se já existe um cliente para este usuário
-        client = Client.objects.filter(user=user).first()
+        client = Client.objects.filter(user_id=user.pk).first()
         if client:
             raise serializers.ValidationError("Cliente já existe para este usuário.")
         
@@ -51,7 +127,7 @@ class ClientSerializer(serializers.ModelSerializer):
 
         # criação do cliente
         client = Client(
-            user=user,
+            user_id=user.pk,
             name=name,
             birthday=birthday,
             cep=cep,
@@ -66,7 +142,7 @@ class ClientSerializer(serializers.ModelSerializer):
         return client
 
     
-class TransporterSerializer(serializers.ModelSerializer):
+class TransporterSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(many=False, read_only=True)
     
     class Meta:
@@ -77,7 +153,7 @@ class TransporterSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
 
         # verifica se já existe um transporter para este usuário
-        transporter = Transporter.objects.filter(user=user).first()
+        transporter = Transporter.objects.filter(user_id=user.pk).first()
         if transporter:
             raise serializers.ValidationError("Transporter já existe para este usuário.")
         
@@ -88,7 +164,7 @@ class TransporterSerializer(serializers.ModelSerializer):
 
         # criação do transporter
         transporter = Transporter(
-            user=user,
+            user_id=user.pk,
             name=name,
             birthday=birthday,
             cnh=cnh,
@@ -99,19 +175,163 @@ class TransporterSerializer(serializers.ModelSerializer):
         return transporter
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(source='product_id', min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+
+# lista de ids de produtos; na leitura vem dos itens já carregados do pedido
+class ProductIdsField(serializers.ListField):
+    child = serializers.IntegerField(min_value=1)
+    # leitura por core.flat: product_id dos itens (acessor "items") de cada pedido
+    flat_related = ('items', 'product_id')
+
+    def get_attribute(self, instance):
+        return [item.product_id for item in instance.items.all()]
+
+
+# status como código; aceita também o texto usado antes da troca para códigos
+class OrderStatusField(serializers.ChoiceField):
+    def __init__(self, **kwargs):
+        super().__init__(Order.Status.choices, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and not data.strip().isdigit():
+            labels = {label.casefold(): value for value, label in Order.Status.choices}
+            data = labels.get(data.strip().casefold(), data)
+        elif isinstance(data, str):
+            data = int(data)
+        return super().to_internal_value(data)
+
+
+# produtos completos do pedido (?expand=products), na ordem dos itens
+class ExpandedProductsSerializer(serializers.ListSerializer):
+    # leitura por core.flat: produto (FK "product") dos itens (acessor "items") de cada pedido
+    flat_through = ('items', 'product')
+
+    def get_attribute(self, instance):
+        return [item.product for item in instance.items.all()]
+
+
+class OrderSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    # os produtos podem ser enviados como lista de ids (quantidade 1) ou como itens com quantidade
+    products = ProductIdsField(required=False)
+    items = OrderItemSerializer(many=True, required=False)
+    status = OrderStatusField(required=False)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
     class Meta:
         model = Order
         fields = '__all__'
+        read_only_fields = ('total_amount', 'status_changed_at')
 
+    expandable_fields = ('products', 'client', 'transporter')
+
+    def build_expanded_field(self, name):
+        if name == 'products':
+            return ExpandedProductsSerializer(child=ProductSerializer(), read_only=True)
+        if name == 'client':
+            return ClientSerializer(read_only=True)
+        return TransporterSerializer(read_only=True)
+
+    @classmethod
+    def expand_queryset(cls, queryset, expand):
+        if 'products' in expand:
+            # os itens já trazem o produto no mesmo SELECT: continua sendo um único prefetch
+            items = Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+            queryset = queryset.prefetch_related(None).prefetch_related(items)
+        related = [f'{name}__user' for name in ('client', 'transporter') if name in expand]
+        return queryset.select_related(*related) if related else queryset
+
+    def validate_status(self, value):
+        if self.instance is not None and not self.instance.can_transition_to(value):
+            current = self.instance.get_status_display()
+            raise serializers.ValidationError(f"Não é possível mudar o status de \"{current}\" para \"{Order.Status(value).label}\".")
+        return value
+
+    def validate(self, attrs):
+        products = attrs.pop('products', None)
+        items = attrs.pop('items', None)
+        if products is None and items is None:
+            if self.instance is None:
+                raise serializers.ValidationError({'items': "Informe os produtos do pedido."})
+            return attrs
+
+        # calcula o total a partir dos preços atuais, buscados em uma única consulta
+        lines = merge_lines(products, items)
+        if not lines:
+            raise serializers.ValidationError({'items': "Informe os produtos do pedido."})
+        prices = load_prices(lines)
+        total, missing = price_lines(lines, prices)
+        if missing:
+            raise serializers.ValidationError({'items': [f"Produto {product_id} não encontrado." for product_id in missing]})
+
+        attrs['total_amount'] = total
+        self._priced_lines = (lines, prices)
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        order = Order.objects.create(**validated_data)
+        self._save_items(order)
+        return order
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        if getattr(self, '_priced_lines', None):
+            instance.items.all().delete()
+            self._save_items(instance)
+        return instance
+
+    def _save_items(self, order):
+        lines, prices = self._priced_lines
+        OrderItem.objects.bulk_create(build_items(order.id, lines, prices))
+        # recarrega os itens uma vez só para a resposta (usados por products e items)
+        getattr(order, '_prefetched_objects_cache', {}).pop('items', None)
+        prefetch_related_objects([order], 'items')
+
+
+# item da criação de pedidos em lote; produtos e transportador são conferidos em uma consulta só
+class OrderBulkItemSerializer(serializers.Serializer):
+    products = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    items = OrderItemSerializer(many=True, required=False)
+    transporter = serializers.IntegerField(required=False, allow_null=True)
+    category_cnh = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        attrs['lines'] = merge_lines(attrs.pop('products', None), attrs.pop('items', None))
+        if not attrs['lines']:
+            raise serializers.ValidationError({'items': "Informe os produtos do pedido."})
+        return attrs
+
+    def validate_category_cnh(self, value):
+        try:
+            return dispatcher.normalize_category(value)
+        except ValueError:
+            raise serializers.ValidationError("Categoria de CNH inválida.")
+
+
+class ProductSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    photo_variants = serializers.SerializerMethodField()
 
-class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+
+    def get_photo_variants(self, product) -> dict:
+        return variant_urls(product.photo_variants, self.context.get('request'))
         
 
-class TransporterStatisticsSerializer(serializers.Serializer):
-    deliveries_per_month = serializers.IntegerField()
-    total_delivery_value = serializers.DecimalField(max_digits=10, decimal_places=2)
+class MonthlyDeliveriesSerializer(serializers.Serializer):
+    month = serializers.DateField(format='%Y-%m')
+    deliveries = serializers.IntegerField()
+    total_value = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False)
+
+
+class TransporterStatisticsSerializer(TimedSerializerMixin, serializers.Serializer):
+    total_deliveries = serializers.IntegerField()
+    total_value = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, allow_null=True)
+    deliveries_per_month = MonthlyDeliveriesSerializer(many=True)
 
@@ -0,0 +1,125 @@
+from collections import Counter
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from core import catalog, models
+from core.authentication import invalidate_token, invalidate_user
+from core.dispatch import dispatcher
+from core.events import record_events
+from core.images import schedule_variants
+from core.statistics import delivery_month, record_deliveries
+
+
+# mantém a carga de pedidos em aberto por transportador usada na escolha automática
+@receiver(post_save, sender=models.Order)
+def update_dispatch_on_order_save(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and set(instance.tracked_fields) - loaded.keys():
+        # instância sem os valores carregados do banco: não há como saber o estado anterior
+        transaction.on_commit(dispatcher.invalidate)
+        return
+
+    changes = Counter()
+    if not created and loaded['status'] in models.Order.OPEN_STATUSES:
+        changes[loaded['transporter_id']] -= 1
+    if instance.is_open:
+        changes[instance.transporter_id] += 1
+
+    for transporter_id, delta in changes.items():
+        if delta:
+            transaction.on_commit(partial(dispatcher.adjust, transporter_id, delta))
+
+
+@receiver(post_delete, sender=models.Order)
+def update_dispatch_on_order_delete(sender, instance, **kwargs):
+    if instance.is_open:
+        transaction.on_commit(partial(dispatcher.adjust, instance.transporter_id, -1))
+
+
+@receiver(post_save, sender=models.Transporter)
+def update_dispatch_on_transporter_save(sender, instance, **kwargs):
+    transaction.on_commit(partial(dispatcher.register, instance.id, instance.category_cnh))
+
+
+@receiver(post_delete, sender=models.Transporter)
+def update_dispatch_on_transporter_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(dispatcher.discard, instance.id))
+
+
+# mantém os totais mensais de entregas; roda na mesma transação da gravação do pedido
+@receiver(post_save, sender=models.Order)
+def update_statistics_on_order_save(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and set(instance.tracked_fields) - loaded.keys():
+        return
+
+    old = None
+    if not created and loaded['status'] == models.Order.Status.DELIVERED:
+        old = (loaded['transporter_id'], delivery_month(loaded['status_changed_at'], loaded['delivery_date']), loaded['total_amount'])
+    new = None
+    if instance.status == models.Order.Status.DELIVERED:
+        new = (instance.transporter_id, delivery_month(instance.status_changed_at, instance.delivery_date), instance.total_amount)
+
+    if old == new:
+        return
+    if old and old[1]:
+        record_deliveries(old[0], old[1], -1, -(old[2] or 0))
+    if new and new[1]:
+        record_deliveries(new[0], new[1], 1, new[2])
+
+
+@receiver(post_delete, sender=models.Order)
+def update_statistics_on_order_delete(sender, instance, **kwargs):
+    # desconta do mês em que a entrega foi somada
+    month = delivery_month(instance.status_changed_at, instance.delivery_date)
+    if instance.status == models.Order.Status.DELIVERED and month:
+        record_deliveries(instance.transporter_id, month, -1, -(instance.total_amount or 0))
+
+
+# registra as mudanças de status no histórico de eventos e avisa os assinantes do feed SSE
+@receiver(post_save, sender=models.Order)
+def record_event_on_order_save(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if created or 'status' not in loaded or loaded['status'] != instance.status:
+        record_events([instance])
+
+
+# invalida o cache do catálogo de produtos
+@receiver(post_save, sender=models.Product)
+@receiver(post_delete, sender=models.Product)
+def invalidate_catalog_on_product_change(sender, **kwargs):
+    transaction.on_commit(catalog.invalidate)
+
+
+# uma foto nova invalida as variantes antigas e agenda a geração das novas
+@receiver(pre_save, sender=models.Product)
+def reset_photo_variants(sender, instance, **kwargs):
+    if instance.photo_changed:
+        instance.photo_variants = {}
+
+
+@receiver(post_save, sender=models.Product)
+def generate_photo_variants(sender, instance, **kwargs):
+    if instance.photo_changed and instance.photo.name:
+        schedule_variants(instance.id, instance.photo.name)
+
+
+# remove do cache de autenticação credenciais e tokens de usuários alterados
+@receiver(post_save, sender=models.CustomUser)
+def invalidate_auth_cache_on_user_save(sender, instance, created=False, update_fields=None, **kwargs):
+    # usuário novo ainda não está em cache; o login só atualiza o last_login, que não afeta a autenticação
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=models.CustomUser)
+def invalidate_auth_cache_on_user_delete(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_auth_cache_on_token_delete(sender, instance, **kwargs):
+    invalidate_token(instance.key)
@@ -0,0 +1,79 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, DecimalField, F, IntegerField, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from django.utils import timezone
+from core import models
+
+
+# mês (primeiro dia) em que a entrega é contabilizada: o da mudança para entregue (status_changed_at,
+# que não muda mais depois disso). Pedidos entregues antes desse campo usam a data do pedido; sem
+# nenhuma das duas, a entrega não é contada (None), nem na soma nem na subtração
+def delivery_month(changed_at, day=None):
+    if changed_at is not None:
+        return timezone.localdate(changed_at).replace(day=1)
+    if day is not None:
+        return day.replace(day=1)
+    return None
+
+
+# mesma regra de delivery_month, calculada no banco
+def delivery_month_expression():
+    return Coalesce(TruncMonth('status_changed_at', output_field=DateField()), TruncMonth('delivery_date'))
+
+
+# soma (ou subtrai, com valores negativos) entregas no total mensal do transportador; a subtração
+# para em zero, caso o total esteja defasado (o rebuild_transporter_statistics acerta os valores)
+def record_deliveries(transporter_id, month, deliveries, value):
+    value = value or Decimal('0')
+    rows = models.TransporterMonthlyStatistics.objects.filter(transporter_id=transporter_id, month=month)
+
+    if rows.update(**_added(deliveries, value)):
+        return
+    if deliveries < 0:
+        # não há total para descontar; o rebuild_transporter_statistics recalcula tudo
+        return
+
+    try:
+        with transaction.atomic():
+            models.TransporterMonthlyStatistics.objects.create(
+                transporter_id=transporter_id, month=month, deliveries=deliveries, total_value=value,
+            )
+    except IntegrityError:
+        # outro processo criou o mesmo mês ao mesmo tempo
+        rows.update(**_added(deliveries, value))
+
+
+# F() + delta, sem passar de zero (PositiveIntegerField)
+def _added(deliveries, value):
+    return {
+        'deliveries': Greatest(F('deliveries') + deliveries, Value(0), output_field=IntegerField()),
+        'total_value': Greatest(F('total_value') + value, Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    }
+
+
+# recalcula todos os totais mensais a partir dos pedidos entregues
+def rebuild_statistics():
+    rows = (
+        models.Order.objects
+        .filter(status=models.Order.Status.DELIVERED)
+        .annotate(month=delivery_month_expression())
+        .filter(month__isnull=False)
+        .values('transporter_id', 'month')
+        .annotate(deliveries=Count('id'), total_value=Sum('total_amount'))
+        .order_by()
+    )
+    totals = {(row['transporter_id'], row['month']): (row['deliveries'], row['total_value'] or Decimal('0')) for row in rows}
+
+    with transaction.atomic():
+        models.TransporterMonthlyStatistics.objects.all().delete()
+        models.TransporterMonthlyStatistics.objects.bulk_create(
+            [
+                models.TransporterMonthlyStatistics(
+                    transporter_id=transporter_id, month=month, deliveries=deliveries, total_value=value,
+                )
+                for (transporter_id, month), (deliveries, value) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
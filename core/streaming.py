@@ -0,0 +1,38 @@
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# No ASGI, o Django 5.0 consome um iterador síncrono de StreamingHttpResponse com
+# sync_to_async(list): a resposta inteira fica em memória antes do primeiro byte. Aqui o
+# iterador é lido em blocos na thread da requisição (thread_sensitive, a mesma das consultas
+# da view), e cada bloco é enviado assim que fica pronto
+
+# partes lidas por ida à thread síncrona
+DEFAULT_BATCH = 500
+
+
+def _next_batch(iterator, size):
+    return list(islice(iterator, size))
+
+
+async def _aiterate(content, size):
+    iterator = iter(content)
+    try:
+        while True:
+            batch = await sync_to_async(_next_batch)(iterator, size)
+            if not batch:
+                return
+            yield ''.join(batch) if isinstance(batch[0], str) else b''.join(batch)
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+# StreamingHttpResponse que transmite aos poucos também no ASGI; batch=1 envia cada parte
+# separadamente (eventos de progresso)
+def streaming_response(request, content, batch=DEFAULT_BATCH, **kwargs):
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _aiterate(content, batch)
+    return StreamingHttpResponse(content, **kwargs)
@@ -0,0 +1,853 @@
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import ConnectionHandler
+from django.test import AsyncClient, RequestFactory, TransactionTestCase
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers as drf_serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from core import benchmark, budget_check, flat, images, imports, media, models, search, serializers
+from core.cache import SQLiteCache
+from core.authentication import token_cache_key
+from core.dispatch import dispatcher
+from core.routers import ReadReplicaRouter
+from core.statistics import rebuild_statistics
+from core.throttling import UserSlidingWindowThrottle
+
+
+class JWTWriteTests(APITestCase):
+    def setUp(self):
+        self.user = models.CustomUser.objects.create_user(cpf='12345678909', password='senha-forte-123')
+        self.client_profile = models.Client.objects.create(
+            user=self.user, name='Ana', birthday=date(1990, 1, 1), cep='01001-000',
+            street='Praça da Sé', number=1, district='Sé', city='São Paulo', uf='SP',
+        )
+        response = self.client.post('/api/v1/auth/jwt/create/', {'cpf': '12345678909', 'password': 'senha-forte-123'})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    # escritas recebem o CustomUser, não o usuário montado das claims
+    def test_patch_me(self):
+        response = self.client.patch('/api/v1/users/me/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cpf'], '12345678909')
+
+    def test_patch_client(self):
+        response = self.client.patch(f'/api/v1/client/{self.client_profile.id}/', {'name': 'Ana Maria'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client_profile.refresh_from_db()
+        self.assertEqual(self.client_profile.name, 'Ana Maria')
+
+    def test_inactive_user_cannot_write(self):
+        models.CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.patch('/api/v1/users/me/', {}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        self.user = models.CustomUser.objects.create_user(cpf='98765432100', password='senha-forte-123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    # o token verificado fica no cache compartilhado e sai dele na revogação, para todos os workers
+    def test_logout_revokes_cached_token(self):
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 200)
+        self.assertIsNotNone(cache.get(token_cache_key(self.token.key)))
+
+        self.assertEqual(self.client.post('/api/v1/auth/token/logout/').status_code, 204)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+
+
+class AsyncPerformanceTests(APITestCase):
+    def setUp(self):
+        self.user = models.CustomUser.objects.create_user(cpf='11144477735', password='senha-forte-123')
+        self.token = Token.objects.create(user=self.user)
+
+    # no caminho assíncrono (ASGI) as consultas da view também são contadas no Server-Timing
+    async def test_server_timing_counts_queries(self):
+        client = AsyncClient()
+        response = await client.get('/api/v1/users/me/', headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        self.user = models.CustomUser.objects.create_user(cpf='28625587887', password='senha-forte-123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.product = models.Product.objects.create(name='Kiwi', value=Decimal('3.50'), weight_kg='1 kg')
+
+    # autenticação, consultas, serialização e renderização aparecem como fases separadas
+    def test_phases(self):
+        for path in ('/api/v1/product/', f'/api/v1/product/{self.product.id}/', '/api/v1/product/search/?q=kiwi'):
+            phases = {item.split(';')[0] for item in self.client.get(path)['Server-Timing'].split(', ')}
+            self.assertLessEqual({'auth', 'db', 'serialize', 'render', 'view', 'total'}, phases, path)
+
+
+class AsyncStreamingTests(APITestCase):
+    def setUp(self):
+        staff = models.CustomUser.objects.create_user(cpf='52998224725', password='senha-forte-123', is_staff=True)
+        self.token = Token.objects.create(user=staff)
+        client = models.Client.objects.create(
+            name='Bia', birthday=date(1991, 1, 1), cep='01001-000',
+            street='Praça da Sé', number=2, district='Sé', city='São Paulo', uf='SP',
+        )
+        transporter = models.Transporter.objects.create(name='Caio', birthday=date(1985, 1, 1), cnh='1', category_cnh='B')
+        models.Order.objects.bulk_create([models.Order(client=client, transporter=transporter) for _ in range(3)])
+
+    # no ASGI o export é transmitido por um iterador assíncrono, não montado inteiro em memória
+    async def test_export_streams_asynchronously(self):
+        response = await AsyncClient().get('/api/v1/order/export/?output=ndjson', headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+
+class StatisticsTests(APITestCase):
+    def setUp(self):
+        self.client_profile = models.Client.objects.create(
+            name='Davi', birthday=date(1992, 1, 1), cep='01001-000',
+            street='Praça da Sé', number=3, district='Sé', city='São Paulo', uf='SP',
+        )
+        self.transporter = models.Transporter.objects.create(name='Eva', birthday=date(1986, 1, 1), cnh='2', category_cnh='B')
+
+    # total defasado (menor que o real): remover uma entrega não pode deixá-lo negativo
+    def test_stale_rollup_is_clamped_at_zero(self):
+        order = models.Order.objects.create(
+            client=self.client_profile, transporter=self.transporter, total_amount=Decimal('10.00'), status=models.Order.Status.DELIVERED,
+        )
+        statistics = models.TransporterMonthlyStatistics.objects.get(transporter=self.transporter)
+        self.assertEqual(statistics.deliveries, 1)
+        models.TransporterMonthlyStatistics.objects.update(deliveries=0, total_value=0)
+
+        order.delete()
+        statistics.refresh_from_db()
+        self.assertEqual((statistics.deliveries, statistics.total_value), (0, 0))
+
+    # a entrega conta no mês em que o pedido foi entregue, não no mês em que foi criado
+    def test_delivery_counts_in_the_month_it_happened(self):
+        order = models.Order.objects.create(client=self.client_profile, transporter=self.transporter, total_amount=Decimal('10.00'))
+        models.Order.objects.filter(pk=order.pk).update(delivery_date=date(2026, 1, 31))
+        order = models.Order.objects.get(pk=order.pk)
+
+        delivered_at = datetime(2026, 2, 1, 9, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=delivered_at):
+            order.status = models.Order.Status.DELIVERED
+            order.save()
+        def months():
+            return list(models.TransporterMonthlyStatistics.objects.values_list('month', 'deliveries'))
+
+        self.assertEqual(months(), [(date(2026, 2, 1), 1)])
+        self.assertEqual(rebuild_statistics(), 1)
+        self.assertEqual(months(), [(date(2026, 2, 1), 1)])
+
+        models.Order.objects.get(pk=order.pk).delete()
+        self.assertEqual(months(), [(date(2026, 2, 1), 0)])
+
+    # pedido entregue sem data nenhuma nunca foi somado: removê-lo não desconta o mês atual
+    def test_undated_delivery_is_not_decremented(self):
+        models.Order.objects.create(
+            client=self.client_profile, transporter=self.transporter, total_amount=Decimal('10.00'), status=models.Order.Status.DELIVERED,
+        )
+        undated = models.Order.objects.create(client=self.client_profile, transporter=self.transporter)
+        models.Order.objects.filter(pk=undated.pk).update(status=models.Order.Status.DELIVERED, status_changed_at=None, delivery_date=None)
+
+        models.Order.objects.get(pk=undated.pk).delete()
+        self.assertEqual(models.TransporterMonthlyStatistics.objects.get().deliveries, 1)
+
+
+class OrderEventRetentionTests(APITestCase):
+    # o purge_order_events apaga só os eventos anteriores ao período de retenção
+    def test_purge_keeps_recent_events(self):
+        client = models.Client.objects.create(
+            name='Jade', birthday=date(1994, 1, 1), cep='01001-000',
+            street='Praça da Sé', number=5, district='Sé', city='São Paulo', uf='SP',
+        )
+        transporter = models.Transporter.objects.create(name='Leo', birthday=date(1988, 1, 1), cnh='4', category_cnh='B')
+        order = models.Order.objects.create(client=client, transporter=transporter)
+        models.OrderEvent.objects.update(created_at=timezone.now() - timedelta(days=40))
+        recent = models.OrderEvent.objects.create(order=order, client_id=client.id, transporter_id=transporter.id, status=order.status)
+
+        call_command('purge_order_events', days=30, stdout=StringIO())
+        self.assertEqual(list(models.OrderEvent.objects.values_list('id', flat=True)), [recent.id])
+
+
+class DispatcherTests(APITestCase):
+    def setUp(self):
+        self.transporters = [
+            models.Transporter.objects.create(name=name, birthday=date(1980, 1, 1), cnh=name, category_cnh='B')
+            for name in ('Fabi', 'Gil')
+        ]
+        dispatcher.invalidate()
+
+    def tearDown(self):
+        dispatcher.invalidate()
+
+    # escolhas seguidas, antes de qualquer confirmação, não caem no mesmo transportador
+    def test_pick_reserves_load(self):
+        first, second = dispatcher.pick(), dispatcher.pick()
+        self.assertEqual({first, second}, {transporter.id for transporter in self.transporters})
+
+        dispatcher.release(first)
+        self.assertEqual(dispatcher.pick(), first)
+
+
+class ExpandTests(APITestCase):
+    class OrderClientSerializer(serializers.SparseFieldsMixin, drf_serializers.ModelSerializer):
+        expandable_fields = ('client',)
+
+        class Meta:
+            model = models.Order
+            fields = ('id', 'client')
+
+    # sem build_expanded_field próprio, o relacionamento vira um serializer aninhado
+    def test_default_expanded_field(self):
+        client = models.Client.objects.create(
+            name='Hugo', birthday=date(1993, 1, 1), cep='01001-000',
+            street='Praça da Sé', number=4, district='Sé', city='São Paulo', uf='SP',
+        )
+        transporter = models.Transporter.objects.create(name='Iris', birthday=date(1987, 1, 1), cnh='3', category_cnh='B')
+        models.Order.objects.create(client=client, transporter=transporter)
+
+        queryset = self.OrderClientSerializer.expand_queryset(models.Order.objects.all(), ('client',))
+        with self.assertNumQueries(1):
+            data = self.OrderClientSerializer(queryset, many=True, expand=('client',)).data
+        self.assertEqual(data[0]['client']['name'], 'Hugo')
+        self.assertEqual(self.OrderClientSerializer(queryset[0]).data['client'], client.id)
+
+
+class UserImportTests(APITestCase):
+    # CPFs cadastrados por outro processo durante a importação contam uma vez só no progresso
+    def test_race_skips_are_counted_once(self):
+        def records():
+            for number, cpf in enumerate(('39053344705', '15350946056', '07068093868', '86288366757'), start=1):
+                # outro processo cria o usuário depois da carga dos CPFs existentes
+                models.CustomUser.objects.create_user(cpf=cpf, password='senha-forte-123')
+                yield number, {
+                    'role': 'transporter', 'cpf': cpf, 'password': 'senha-forte-123', 'name': f'T{number}',
+                    'birthday': '1980-01-01', 'cnh': str(number), 'category_cnh': 'B',
+                }
+
+        events = list(imports.UserImporter(chunk_size=1, workers=1).run(records()))
+        progress = [event for event in events if event['event'] == 'progress']
+        self.assertEqual([event['skipped'] for event in progress], [1, 2, 3, 4])
+        self.assertEqual(events[-1], {'event': 'done', 'position': 4, 'created': 0, 'skipped': 4, 'invalid': 0})
+
+
+class QueryBudgetTests(APITestCase):
+    # as mesmas chamadas do comando check_query_budgets, em todas as rotas do router
+    def test_routes_within_budget(self):
+        rows, failures = budget_check.run()
+        self.assertEqual(failures, [])
+        self.assertEqual(len(rows), len(budget_check.router_actions()))
+
+
+class FlatPlanTests(APITestCase):
+    def setUp(self):
+        user = models.CustomUser.objects.create_user(cpf='52998224725', password='senha-forte-123')
+        address = {
+            'birthday': date(1991, 2, 3), 'cep': '01001-000', 'street': 'Praça da Sé',
+            'number': 7, 'district': 'Sé', 'city': 'São Paulo', 'uf': 'SP',
+        }
+        # com e sem usuário: o serializer aninhado do usuário também pode ser nulo
+        clients = [models.Client.objects.create(user=user, name='Joana', **address), models.Client.objects.create(name='Kátia', **address)]
+        transporter = models.Transporter.objects.create(name='Luiz', birthday=date(1980, 5, 6), cnh='123', category_cnh='B')
+        products = [
+            models.Product.objects.create(name='Maçã', value='4.50', weight_kg='1 kg'),
+            models.Product.objects.create(
+                name='Uva', value='12.00', weight_kg='500 g', photo='client_photos/uva.jpg',
+                photo_variants={'thumb': {'webp': 'client_photos/uva-thumb.webp'}},
+            ),
+        ]
+        for client, status in zip(clients, (models.Order.Status.OUT_FOR_DELIVERY, models.Order.Status.DELIVERED)):
+            order = models.Order.objects.create(client=client, transporter=transporter, total_amount='16.50', status=status)
+            for product in products:
+                models.OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=product.value)
+        models.Order.objects.create(client=clients[0], transporter=transporter, total_amount='0.00')
+
+    # cada plano devolve o mesmo que o serializer do DRF, na mesma ordem de campos
+    def test_plan_matches_serializer(self):
+        cases = [
+            (serializers.ClientSerializer, {}),
+            (serializers.ClientSerializer, {'fields': ('id', 'name', 'user')}),
+            (serializers.TransporterSerializer, {}),
+            (serializers.ProductSerializer, {}),
+            (serializers.ProductSerializer, {'fields': ('photo', 'photo_variants', 'value')}),
+            (serializers.OrderSerializer, {}),
+            (serializers.OrderSerializer, {'expand': ('products',)}),
+            (serializers.OrderSerializer, {'expand': ('client', 'transporter')}),
+            (serializers.OrderSerializer, {'fields': ('id', 'status_display'), 'expand': ('products',)}),
+        ]
+        for serializer_class, options in cases:
+            with self.subTest(serializer=serializer_class.__name__, **options):
+                plan = flat.FlatPlan(serializer_class, **options)
+                queryset = plan.model.objects.order_by('id')
+                rows = queryset.values(*plan.lookups)
+                expected = serializer_class(serializer_class.expand_queryset(queryset, options.get('expand', ())), many=True, **options).data
+                data = plan.serialize(list(rows), serializer_class(**options))
+                self.assertEqual([list(row.items()) for row in data], [list(row.items()) for row in expected])
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        user = models.CustomUser.objects.create_user(cpf='11144477735', password='senha-forte-123')
+        client = models.Client.objects.create(
+            user=user, name='Marta', birthday=date(1992, 3, 4), cep='01001-000',
+            street='Praça da Sé', number=2, district='Sé', city='São Paulo', uf='SP',
+        )
+        transporter = models.Transporter.objects.create(name='Nei', birthday=date(1981, 1, 1), cnh='9', category_cnh='B')
+        days = (date(2024, 3, 1), date(2024, 3, 1), date(2024, 2, 1), None, date(2024, 4, 1), None, date(2024, 2, 1))
+        orders = [models.Order.objects.create(client=client, transporter=transporter) for _ in days]
+        for order, day in zip(orders, days):
+            models.Order.objects.filter(pk=order.pk).update(delivery_date=day)
+        # mais recentes primeiro, empates pelo id e pedidos sem data no fim
+        self.expected = [order.id for order, day in sorted(
+            zip(orders, days), key=lambda pair: (pair[1] is None, -(pair[1] or date.min).toordinal(), -pair[0].id),
+        )]
+        self.client.force_authenticate(user)
+
+    def pages(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([order['id'] for order in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_next_and_previous_cursors(self):
+        forward = self.pages('/api/v1/order/?page_size=2', 'next')
+        self.assertEqual([order_id for page in forward for order_id in page], self.expected)
+        self.assertEqual([len(page) for page in forward], [2, 2, 2, 1])
+
+        # volta da última página até a primeira pelos cursores "previous"
+        last = self.client.get('/api/v1/order/?page_size=2')
+        while last.data['next']:
+            last = self.client.get(last.data['next'])
+        backward = self.pages(last.data['previous'], 'previous')
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/order/?cursor=bm9wZQ')
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(models.CustomUser.objects.create_user(cpf='22233344405', password='senha-forte-123'))
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Product.objects.create(name='Pera', value='6.00', weight_kg='1 kg')
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/v1/product/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # versão e página no cache: a revalidação não consulta o banco
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # outra URL, outra representação
+        self.assertNotEqual(self.client.get('/api/v1/product/?page_size=1')['ETag'], etag)
+
+    def test_product_change_invalidates(self):
+        etag = self.client.get('/api/v1/product/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Product.objects.create(name='Caqui', value='8.00', weight_kg='1 kg')
+
+        response = self.client.get('/api/v1/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([product['name'] for product in response.data['results']], ['Caqui', 'Pera'])
+
+
+class MediaRangeTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        Path(directory.name, 'foto.jpg').write_bytes(bytes(range(100)))
+        self.enterContext(self.settings(MEDIA_ROOT=directory.name, MEDIA_SERVE_BACKEND='python'))
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        response = media.serve(self.factory.get('/media/foto.jpg', headers=headers), 'foto.jpg')
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_ranges(self):
+        response, body = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(body, bytes(range(10, 20)))
+
+        # sufixo e fim além do tamanho do arquivo
+        self.assertEqual(self.get(Range='bytes=-5')[1], bytes(range(95, 100)))
+        self.assertEqual(self.get(Range='bytes=90-500')[0]['Content-Range'], 'bytes 90-99/100')
+
+        for header in ('bytes=100-', 'bytes=20-10', 'bytes=-0'):
+            response, _ = self.get(Range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # vários intervalos não são atendidos: vai o arquivo inteiro
+        response, body = self.get(Range='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(body), 100)
+
+    def test_if_range(self):
+        full, _ = self.get()
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range=full['ETag'])[0].status_code, 206)
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range=full['Last-Modified'])[0].status_code, 206)
+        # arquivo alterado desde a validação: o intervalo dá lugar ao arquivo inteiro
+        response, body = self.get(Range='bytes=0-9', If_Range='"outra-versao"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, bytes(range(100)))
+
+        self.assertEqual(self.get(If_None_Match=full['ETag'])[0].status_code, 304)
+
+
+class OrderStatusTests(APITestCase):
+    def setUp(self):
+        user = models.CustomUser.objects.create_user(cpf='33366699910', password='senha-forte-123')
+        client = models.Client.objects.create(
+            user=user, name='Olga', birthday=date(1994, 4, 4), cep='01001-000',
+            street='Praça da Sé', number=5, district='Sé', city='São Paulo', uf='SP',
+        )
+        transporter = models.Transporter.objects.create(name='Paulo', birthday=date(1982, 2, 2), cnh='8', category_cnh='B')
+        self.order = models.Order.objects.create(client=client, transporter=transporter)
+        self.client.force_authenticate(user)
+
+    def patch_status(self, status):
+        return self.client.patch(f'/api/v1/order/{self.order.id}/', {'status': status}, format='json')
+
+    def test_transitions(self):
+        # o texto usado antes dos códigos continua aceito
+        response = self.patch_status('Pedido entregue')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], models.Order.Status.DELIVERED)
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.status_changed_at)
+
+        # entregue e cancelado são finais
+        self.assertEqual(self.patch_status(models.Order.Status.CANCELED).status_code, 400)
+        self.assertEqual(self.patch_status(models.Order.Status.DELIVERED).status_code, 200)
+        self.assertEqual(self.patch_status('desconhecido').status_code, 400)
+
+    def test_model_rules(self):
+        self.assertTrue(self.order.can_transition_to(models.Order.Status.CANCELED))
+        self.order.status = models.Order.Status.CANCELED
+        self.order.save()
+        self.assertFalse(self.order.can_transition_to(models.Order.Status.OUT_FOR_DELIVERY))
+        self.order.status = models.Order.Status.OUT_FOR_DELIVERY
+        with self.assertRaises(ValidationError):
+            self.order.clean()
+
+
+class OrderStatusMigrationTests(TransactionTestCase):
+    before = [('core', '0023_product_photo_variants')]
+    after = [('core', '0024_order_status_codes')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    # textos antigos viram códigos (sem diferenciar maiúsculas nem espaços); o resto, "saiu para entrega"
+    def test_status_text_to_code(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Client, Transporter, Order = (apps.get_model('core', name) for name in ('Client', 'Transporter', 'Order'))
+        client = Client.objects.create(
+            name='Rita', birthday=date(1990, 1, 1), cep='01001-000',
+            street='Praça da Sé', number=6, district='Sé', city='São Paulo', uf='SP',
+        )
+        transporter = Transporter.objects.create(name='Saulo', birthday=date(1980, 1, 1), cnh='7', category_cnh='B')
+        texts = {
+            ' pedido ENTREGUE ': models.Order.Status.DELIVERED,
+            'Pedido cancelado': models.Order.Status.CANCELED,
+            'Seu pedido saiu para entrega e está a caminho do seu endereço': models.Order.Status.OUT_FOR_DELIVERY,
+            'Em separação': models.Order.Status.OUT_FOR_DELIVERY,
+        }
+        ids = {Order.objects.create(client=client, transporter=transporter, status=text).id: code for text, code in texts.items()}
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        Order = executor.loader.project_state(self.after).apps.get_model('core', 'Order')
+        self.assertEqual(dict(Order.objects.values_list('id', 'status')), ids)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        if not search.has_fts('default'):
+            self.skipTest('SQLite sem FTS5')
+        for name in ('Maçã Fuji', 'Macarrão', 'Mamão formosa', 'Limão'):
+            models.Product.objects.create(name=name, value='1.00', weight_kg='1 kg')
+
+    def names(self, query):
+        return sorted(product.name for product in search.search_products(query))
+
+    def test_accents_and_prefixes(self):
+        # sem acentos e cada termo como prefixo
+        self.assertEqual(self.names('maca'), ['Macarrão', 'Maçã Fuji'])
+        self.assertEqual(self.names('MAÇÃ'), ['Macarrão', 'Maçã Fuji'])
+        self.assertEqual(self.names('ma fu'), ['Maçã Fuji'])
+        self.assertEqual(self.names('limao'), ['Limão'])
+        # termos de uma letra só casam com a palavra inteira
+        self.assertEqual(self.names('m'), [])
+
+        self.client.force_authenticate(models.CustomUser.objects.create_user(cpf='44455566670', password='senha-forte-123'))
+        response = self.client.get('/api/v1/product/search/?q=mam')
+        self.assertEqual([product['name'] for product in response.data], ['Mamão formosa'])
+
+    # os gatilhos mantêm o índice em dia com update(), bulk_create e exclusões
+    def test_triggers_keep_index_in_sync(self):
+        models.Product.objects.filter(name='Limão').update(name='Lima da Pérsia')
+        models.Product.objects.bulk_create([models.Product(name='Limonada', value='2.00', weight_kg='1 l')])
+        self.assertEqual(self.names('lim'), ['Lima da Pérsia', 'Limonada'])
+        self.assertEqual(self.names('limao'), [])
+
+        models.Product.objects.filter(name='Limonada').delete()
+        self.assertEqual(self.names('lim'), ['Lima da Pérsia'])
+
+
+class SQLiteCacheTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = Path(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('chave', 1, timeout=10))
+        self.assertFalse(self.cache.add('chave', 2, timeout=10))
+        self.assertEqual(self.cache.get('chave'), 1)
+
+        # vencida, a entrada pode ser gravada de novo
+        with mock.patch('time.time', return_value=timezone.now().timestamp() + 11):
+            self.assertIsNone(self.cache.get('chave'))
+            self.assertTrue(self.cache.add('chave', 3, timeout=10))
+            self.assertEqual(self.cache.get('chave'), 3)
+
+    def test_incr(self):
+        self.cache.set('contador', 1, timeout=10)
+        self.assertEqual(self.cache.incr('contador'), 2)
+        self.assertEqual(self.cache.decr('contador', 5), -3)
+        # valores que não são inteiros passam pelo pickle
+        self.cache.set('decimal', Decimal('1.5'))
+        self.assertEqual(self.cache.incr('decimal'), Decimal('2.5'))
+        self.assertEqual(self.cache.get('decimal'), Decimal('2.5'))
+        self.cache.set('flag', True)
+        self.assertIs(self.cache.get('flag'), True)
+
+        with self.assertRaises(ValueError):
+            self.cache.incr('ausente')
+        with mock.patch('time.time', return_value=timezone.now().timestamp() + 11):
+            with self.assertRaises(ValueError):
+                self.cache.incr('contador')
+
+    # cada thread tem a sua conexão; nenhum incremento se perde
+    def test_incr_is_atomic(self):
+        self.cache.set('contador', 0)
+
+        def worker():
+            cache = SQLiteCache(self.location, {})
+            for _ in range(50):
+                cache.incr('contador')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('contador'), 200)
+
+
+class SlidingWindowThrottleTests(APITestCase):
+    class Throttle(UserSlidingWindowThrottle):
+        rate = '3/min'
+
+    def setUp(self):
+        cache.clear()
+        request = Request(RequestFactory().get('/'))
+        request.user = models.CustomUser.objects.create_user(cpf='55566677781', password='senha-forte-123')
+        self.request = request
+
+    def allow(self, now):
+        throttle = self.Throttle()
+        throttle.timer = lambda: now
+        return throttle.allow_request(self.request, None), throttle
+
+    def test_sliding_window(self):
+        start = 600.0
+        self.assertEqual([self.allow(start + second)[0] for second in (0, 10, 20, 30)], [True, True, True, False])
+        allowed, throttle = self.allow(start + 40)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 20)
+
+        # no meio da janela seguinte, as 3 anteriores pesam 1.5: cabe só mais uma
+        self.assertTrue(self.allow(start + 90)[0])
+        allowed, throttle = self.allow(start + 90)
+        self.assertFalse(allowed)
+        # a recusa não conta: a sobra de 0.5 some em 10 s, quando a anterior pesa 1
+        self.assertAlmostEqual(throttle.wait(), 10)
+        self.assertTrue(self.allow(start + 100)[0])
+
+        # duas janelas depois, a contagem recomeça
+        self.assertEqual([self.allow(start + 240 + second)[0] for second in (0, 1, 2, 3)], [True, True, True, False])
+
+
+class OrderBulkTests(APITestCase):
+    def setUp(self):
+        user = models.CustomUser.objects.create_user(cpf='66677788809', password='senha-forte-123')
+        models.Client.objects.create(
+            user=user, name='Rita', birthday=date(1991, 6, 6), cep='01001-000',
+            street='Praça da Sé', number=6, district='Sé', city='São Paulo', uf='SP',
+        )
+        self.transporter = models.Transporter.objects.create(name='Saulo', birthday=date(1983, 3, 3), cnh='7', category_cnh='B')
+        self.product = models.Product.objects.create(name='Uva', value='8.00', weight_kg='1 kg')
+        self.client.force_authenticate(user)
+
+    def bulk(self, orders):
+        return self.client.post('/api/v1/order/bulk/', {'orders': orders}, format='json')
+
+    # os itens válidos são gravados e os inválidos voltam com a posição na lista
+    def test_partial_success(self):
+        response = self.bulk([
+            {'products': [self.product.id], 'transporter': self.transporter.id},
+            {'products': [999999]},
+            {'items': []},
+            {'items': [{'product': self.product.id, 'quantity': 3}]},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        orders = models.Order.objects.filter(id__in=response.data['created']).order_by('id')
+        self.assertEqual([order.total_amount for order in orders], [Decimal('8.00'), Decimal('24.00')])
+        self.assertTrue(all(order.transporter_id == self.transporter.id for order in orders))
+
+    def test_all_invalid(self):
+        response = self.bulk([{'products': [999999]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], [])
+        self.assertFalse(models.Order.objects.exists())
+        self.assertEqual(self.bulk([]).status_code, 400)
+
+
+class OrderPricingTests(APITestCase):
+    def setUp(self):
+        user = models.CustomUser.objects.create_user(cpf='77788899906', password='senha-forte-123')
+        models.Client.objects.create(
+            user=user, name='Sara', birthday=date(1993, 7, 7), cep='01001-000',
+            street='Praça da Sé', number=7, district='Sé', city='São Paulo', uf='SP',
+        )
+        self.transporter = models.Transporter.objects.create(name='Téo', birthday=date(1984, 4, 4), cnh='6', category_cnh='B')
+        self.apple = models.Product.objects.create(name='Maçã', value='2.50', weight_kg='1 kg')
+        self.pear = models.Product.objects.create(name='Pera', value='4.00', weight_kg='1 kg')
+        self.client.force_authenticate(user)
+
+    # o total vem dos preços do banco, não do que o cliente envia
+    def test_total_from_current_prices(self):
+        response = self.client.post('/api/v1/order/', {
+            'transporter': self.transporter.id, 'total_amount': '0.01',
+            'products': [self.apple.id], 'items': [{'product': self.apple.id}, {'product': self.pear.id, 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('13.00'))
+        self.assertEqual(
+            sorted((item['product'], item['quantity'], item['unit_price']) for item in response.data['items']),
+            [(self.apple.id, 2, '2.50'), (self.pear.id, 2, '4.00')],
+        )
+
+        # o preço unitário fica registrado no item: mudar o produto não altera o pedido
+        models.Product.objects.filter(pk=self.apple.pk).update(value='9.00')
+        order = models.Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total_amount, Decimal('13.00'))
+        self.assertEqual(order.items.get(product=self.apple).unit_price, Decimal('2.50'))
+
+        # trocar os itens recalcula o total com os preços atuais
+        response = self.client.patch(f'/api/v1/order/{order.id}/', {'products': [self.apple.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('9.00'))
+
+    def test_unknown_product(self):
+        response = self.client.post('/api/v1/order/', {'transporter': self.transporter.id, 'products': [999999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+
+
+class OrderRouteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = models.CustomUser.objects.create_user(cpf='88899900004', password='senha-forte-123')
+        self.transporter = models.Transporter.objects.create(
+            user=user, name='Vera', birthday=date(1985, 5, 5), cnh='5', category_cnh='B',
+        )
+        addresses = (
+            ('01001-000', 'Sé', 'Rua B'), ('01001-000', ' sé ', 'Rua A'), ('04001-000', 'Paraíso', 'Rua C'),
+            ('01002-000', 'Sé', 'Rua D'), ('', 'Sem CEP', 'Rua E'),
+        )
+        self.orders = []
+        for number, (cep, district, street) in enumerate(addresses, start=1):
+            client = models.Client.objects.create(
+                name=f'Cliente {number}', birthday=date(1990, 1, 1), cep=cep,
+                street=street, number=number, district=district, city='São Paulo', uf='SP',
+            )
+            self.orders.append(models.Order.objects.create(client=client, transporter=self.transporter))
+        # pedidos entregues ficam fora da rota
+        delivered = models.Order.objects.create(client=client, transporter=self.transporter)
+        models.Order.objects.filter(pk=delivered.pk).update(status=models.Order.Status.DELIVERED)
+        self.client.force_authenticate(user)
+
+    def test_stops(self):
+        response = self.client.get('/api/v1/order/route/')
+        self.assertEqual(response.status_code, 200)
+        stops = response.data['stops']
+        # mesmo setor de CEP e bairro viram uma parada, com os pedidos pela rua; sem CEP conhecido vai para o fim
+        self.assertEqual([[order['id'] for order in stop['orders']] for stop in stops], [
+            [self.orders[1].id, self.orders[0].id], [self.orders[3].id], [self.orders[2].id], [self.orders[4].id],
+        ])
+        self.assertEqual([stop['sequence'] for stop in stops], [1, 2, 3, 4])
+        self.assertEqual(stops[0]['distance_km'], 0.0)
+        self.assertEqual(stops[1]['distance_km'], 0.01)
+        self.assertIsNone(stops[3]['distance_km'])
+
+        # a rota fica em cache até os pedidos mudarem
+        self.assertEqual(self.client.get('/api/v1/order/route/').data['generated_at'], response.data['generated_at'])
+        models.Order.objects.filter(pk=self.orders[2].pk).update(status=models.Order.Status.DELIVERED)
+        stops = self.client.get('/api/v1/order/route/').data['stops']
+        self.assertEqual(len(stops), 3)
+
+    def test_only_transporters(self):
+        self.client.force_authenticate(models.CustomUser.objects.create_user(cpf='99900011102', password='senha-forte-123'))
+        self.assertEqual(self.client.get('/api/v1/order/route/').status_code, 403)
+
+
+class ProductPhotoVariantTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=directory.name, PRODUCT_IMAGE_ASYNC=False))
+        self.root = Path(directory.name)
+        (self.root / 'client_photos').mkdir()
+        # PNG com transparência, que o JPEG precisa achatar sobre fundo branco
+        Image.new('RGBA', (800, 400), (255, 0, 0, 0)).save(self.root / 'client_photos' / 'kiwi.png')
+
+    def test_variants_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = models.Product.objects.create(name='Kiwi', value='5.00', weight_kg='1 kg', photo='client_photos/kiwi.png')
+        product.refresh_from_db()
+        variants = product.photo_variants
+        self.assertEqual(set(variants), set(images.DEFAULT_VARIANTS))
+        with Image.open(self.root / variants['thumbnail']['webp']) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (200, 100)))
+        with Image.open(self.root / variants['thumbnail']['jpeg']) as image:
+            self.assertEqual((image.format, image.mode), ('JPEG', 'RGB'))
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+        # a imagem menor que a variante não é ampliada
+        with Image.open(self.root / variants['full']['jpeg']) as image:
+            self.assertEqual(image.size, (800, 400))
+
+        # o nome leva o hash do conteúdo: gerar de novo reaproveita os mesmos arquivos
+        self.assertEqual(images.generate_variants('client_photos/kiwi.png'), variants)
+        self.assertEqual(len(list((self.root / images.VARIANTS_DIR).iterdir())), 6)
+
+        self.client.force_authenticate(models.CustomUser.objects.create_user(cpf='10120230340', password='senha-forte-123'))
+        response = self.client.get(f'/api/v1/product/{product.id}/')
+        self.assertTrue(response.data['photo_variants']['medium']['webp'].startswith('http://testserver/'))
+
+
+class DatabaseProfileTests(APITestCase):
+    def test_read_replica_router(self):
+        router = ReadReplicaRouter()
+        with mock.patch.dict(connections.databases):
+            # sem a conexão de leitura (perfil básico), o roteador não opina
+            connections.databases.pop('replica', None)
+            self.assertIsNone(router.db_for_read(models.Product))
+            connections.databases['replica'] = {}
+            # os testes rodam dentro de uma transação: a leitura fica na principal
+            self.assertEqual(router.db_for_read(models.Product), 'default')
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                self.assertEqual(router.db_for_read(models.Product), 'replica')
+        self.assertEqual(router.db_for_write(models.Product), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+
+    def test_pragmas_and_read_only(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        name = str(Path(directory.name, 'perfil.sqlite3'))
+        handler = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name},
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name, 'READ_ONLY': True},
+        })
+        self.addCleanup(handler.close_all)
+        with self.settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 5000}):
+            with handler['default'].cursor() as cursor:
+                cursor.execute('CREATE TABLE t (id INTEGER)')
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+            with handler['replica'].cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 5000)
+                cursor.execute('SELECT COUNT(*) FROM t')
+                with self.assertRaises(OperationalError):
+                    cursor.execute('INSERT INTO t VALUES (1)')
+
+
+class BenchmarkTests(APITestCase):
+    def test_seed(self):
+        first = benchmark.seed(clients=3, transporters=2, products=4, orders_per_client=2)
+        # cada carga tem sua tag: o mesmo banco pode receber outra sem conflito de CPF
+        second = benchmark.seed(clients=3, transporters=2, products=4, orders_per_client=2)
+        self.assertNotEqual(first.tag, second.tag)
+        self.assertEqual((len(second.clients), len(second.transporters)), (3, 2))
+        self.assertTrue(all(cpf.startswith(second.tag) for cpf, _ in second.clients + second.transporters))
+        self.assertEqual(models.Product.objects.filter(id__in=second.product_ids).count(), 4)
+        self.assertEqual(models.Order.objects.filter(client__user__cpf__startswith=second.tag).count(), 6)
+
+        # as contas geradas entram com a senha da carga e com o próprio token
+        cpf, key = max(second.clients, key=lambda account: models.Order.objects.filter(client__user__cpf=account[0]).count())
+        response = self.client.post('/api/v1/auth/jwt/create/', {'cpf': cpf, 'password': benchmark.PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        orders = models.Order.objects.filter(client__user__cpf=cpf).values_list('id', flat=True)
+        self.assertEqual(sorted(order['id'] for order in self.client.get('/api/v1/order/').data['results']), sorted(orders))
+
+    def test_summarize(self):
+        samples = [('login', 200, 0.010, 3), ('login', 401, 0.030, 2), ('order_list', 200, 0.020, None)]
+        summary = benchmark.summarize(samples, duration=2)
+        self.assertEqual(summary['overall']['requests'], 3)
+        self.assertEqual(summary['overall']['errors'], 1)
+        self.assertEqual(summary['overall']['rps'], 1.5)
+        self.assertEqual(summary['overall']['p50_ms'], 20)
+        self.assertEqual(summary['scenarios']['login']['queries_per_request'], 2.5)
+        self.assertIsNone(summary['scenarios']['order_list']['queries_per_request'])
+        self.assertEqual(benchmark.percentile(list(range(1, 101)), 0.95), 95)
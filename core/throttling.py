@@ -0,0 +1,57 @@
+from django.core.cache import caches
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+# janela deslizante aproximada com dois contadores de janela fixa: o pedido atual conta na janela
+# corrente e a anterior pesa proporcionalmente ao tempo que ainda se sobrepõe à janela deslizante.
+# São só incr() atômicos (core.cache.SQLiteCache), então o limite vale para todos os workers,
+# ao contrário do histórico de horários do SimpleRateThrottle, lido e regravado a cada requisição
+
+
+class SlidingWindowThrottleMixin:
+    cache_alias = 'default'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        cache = caches[self.cache_alias]
+        now = self.timer()
+        window = int(now // self.duration)
+        current_key = f'{self.key}:{window}'
+        # as duas janelas precisam existir enquanto puderem ser consultadas
+        cache.add(current_key, 0, timeout=2 * self.duration)
+        previous = cache.get(f'{self.key}:{window - 1}', 0)
+        try:
+            count = cache.incr(current_key)
+        except ValueError:
+            # descartada entre o add e o incr (limpeza do cache)
+            cache.set(current_key, 1, timeout=2 * self.duration)
+            count = 1
+
+        overlap = 1 - (now % self.duration) / self.duration
+        self.estimate = previous * overlap + count
+        if self.estimate > self.num_requests:
+            # a requisição recusada não conta
+            cache.decr(current_key)
+            self.previous, self.elapsed = previous, now % self.duration
+            return False
+        return True
+
+    # segundos até a janela deslizante liberar uma requisição
+    def wait(self):
+        if not self.previous:
+            return self.duration - self.elapsed
+        # a contribuição da janela anterior cai previous/duration por segundo
+        excess = self.estimate - self.num_requests
+        return min(self.duration - self.elapsed, excess * self.duration / self.previous)
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottleMixin, UserRateThrottle):
+    pass
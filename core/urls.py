@@ -1,9 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include
+import re
+from django.urls import path, include, re_path
 from rest_framework.routers import SimpleRouter
 from django.conf import settings
-from django.conf.urls.static import static
-from .views import CustomUserViewSet, ClientViewSet, TransporterViewSet, ProductViewSet, OrderViewSet, TransporterStatisticsViewSet
+from core import media
+from .views import CustomUserViewSet, ClientViewSet, TransporterViewSet, ProductViewSet, OrderViewSet, TransporterStatisticsViewSet, PerformanceViewSet, order_events
 
 
 router = SimpleRouter()
@@ -13,10 +14,17 @@ router.register('transporter', TransporterViewSet)
 router.register('product', ProductViewSet)
 router.register('order', OrderViewSet)
 router.register('transporter-statistics', TransporterStatisticsViewSet, basename='transporter-statistics')
+router.register('performance', PerformanceViewSet, basename='performance')
 
 urlpatterns = [
+    # antes das rotas do router, que tratariam "events" como id de pedido
+    path('api/v1/order/events/', order_events, name='order-events'),
     path('api/v1/', include(router.urls)),
     path('api/v1/admin/', admin.site.urls),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# arquivos de mídia; com MEDIA_SERVE_BACKEND = 'none' o servidor web da frente os entrega diretamente
+if getattr(settings, 'MEDIA_SERVE_BACKEND', 'python') != 'none':
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', media.serve, name='media'),
+    ]
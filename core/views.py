@@ -1,19 +1,54 @@
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django_filters import rest_framework as filters
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from rest_framework.authtoken.models import Token
+from rest_framework.parsers import MultiPartParser
 from django.db.models import Count, Sum
-from datetime import datetime
-from random import choice
-from core import serializers, models
+import asyncio
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.core.serializers.json import DjangoJSONEncoder
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from core import catalog, events, exports, imports, performance, routing, search, serializers, models
+from core.dispatch import dispatcher
+from core.flat import FlatReadMixin
+from core.pagination import OrderKeysetPagination
+from core.pricing import build_items, load_prices, price_lines
+from core.roles import resolve_role
+from core.streaming import streaming_response
 
 
 # realiza o registro personalizado de usuários
 class CustomUserViewSet(DjoserUserViewSet):
+    # as remoções contam as consultas das cascatas (token, perfil, pedidos e seus itens e eventos)
+    query_budgets = {
+        'list': 2, 'retrieve': 2, 'create': 5, 'update': 4, 'partial_update': 4, 'destroy': 14,
+        'register': 3, 'import_users': 6,
+        'me': {'get': 1, 'put': 3, 'patch': 3, 'delete': 16},
+        'activation': 3, 'reset_password_confirm': 3, 'reset_username_confirm': 4, 'set_password': 3, 'set_username': 4,
+    }
+
+    # CustomUser não tem e-mail: as rotas do djoser que procuram o usuário pelo e-mail sempre
+    # falhariam com FieldError (500), então ficam fora do router
+    resend_activation = reset_password = reset_username = None
+
     @action(detail=False, methods=['post'])
     def register(self, request):
         serializer = serializers.CustomUserSerializer(data=request.data)
@@ -21,11 +56,60 @@ class CustomUserViewSet(DjoserUserViewSet):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    # importação em lote (core.imports): o arquivo vem em multipart ("file") ou direto no corpo
+    # (text/csv ou application/x-ndjson) e o progresso volta em NDJSON enquanto a importação roda
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('role', str, enum=list(imports.ROLES), description='Papel das linhas sem a coluna "role".'),
+            OpenApiParameter('input', str, enum=list(imports.FORMATS), description='Formato do arquivo (padrão: pelo nome ou Content-Type).'),
+        ],
+        request={'multipart/form-data': {'type': 'object', 'properties': {'file': {'type': 'string', 'format': 'binary'}}}},
+        responses={(200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def import_users(self, request):
+        role = request.query_params.get('role') or None
+        if role is not None and role not in imports.ROLES:
+            raise ValidationError({'role': f"Use um destes papéis: {', '.join(imports.ROLES)}."})
+        input_format = request.query_params.get('input')
+        if input_format is not None and input_format not in imports.FORMATS:
+            raise ValidationError({'input': f"Use um destes formatos: {', '.join(imports.FORMATS)}."})
+
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError({'file': "Envie o arquivo no campo \"file\"."})
+            name, chunks = upload.name, upload.chunks()
+        else:
+            stream = request.stream
+            if stream is None:
+                raise ValidationError({'file': "Envie o arquivo no corpo da requisição."})
+            name, chunks = '', iter(partial(stream.read, 64 * 1024), b'')
+        path, checkpoint = imports.save_upload(chunks)
+        input_format = input_format or imports.detect_format(name, request.content_type)
+        # poucos processos por requisição: o comando import_users é quem usa todas as CPUs
+        workers = getattr(settings, 'USER_IMPORT_API_WORKERS', 1)
+        importer = imports.UserImporter(role=role, workers=workers, checkpoint=checkpoint)
+
+        def stream_events():
+            try:
+                with open(path, 'rb') as file:
+                    for event in importer.run(imports.read_records(file, input_format)):
+                        yield json.dumps(event, ensure_ascii=False) + '\n'
+            finally:
+                path.unlink(missing_ok=True)
+
+        response = streaming_response(request, stream_events(), batch=1, content_type='application/x-ndjson')
+        patch_cache_control(response, no_store=True)
+        return response
+
 
 # gerencia clientes
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(FlatReadMixin, viewsets.ModelViewSet):
     serializer_class = serializers.ClientSerializer
-    queryset = models.Client.objects.all()
+    # o usuário é serializado junto (CustomUserSerializer): vem no mesmo SELECT
+    queryset = models.Client.objects.select_related('user')
+    query_budgets = {'list': 2, 'retrieve': 2, 'create': 4, 'update': 3, 'partial_update': 3, 'destroy': 24}
     filter_backends = (filters.DjangoFilterBackend, )
     filterset_fields = ('user',)
     search_fields = ('user__username', 'user__email')
@@ -73,9 +157,10 @@ class ClientViewSet(viewsets.ModelViewSet):
     
 
 # gerencia transporters
-class TransporterViewSet(viewsets.ModelViewSet):
+class TransporterViewSet(FlatReadMixin, viewsets.ModelViewSet):
     serializer_class = serializers.TransporterSerializer
-    queryset = models.Transporter.objects.all()
+    queryset = models.Transporter.objects.select_related('user')
+    query_budgets = {'list': 2, 'retrieve': 2, 'create': 4, 'update': 3, 'partial_update': 3, 'destroy': 26}
     filter_backends = (filters.DjangoFilterBackend, )
     filterset_fields = ('user',)
     search_fields = ('user__username', 'user__email')
@@ -122,9 +207,54 @@ class TransporterViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)  
     
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(FlatReadMixin, viewsets.ModelViewSet):
     queryset = models.Product.objects.all()
     serializer_class = serializers.ProductSerializer
+    query_budgets = {'list': 3, 'retrieve': 2, 'search': 2, 'create': 4, 'update': 4, 'partial_update': 4, 'destroy': 7}
+
+    # listagem do catálogo com cache versionado e GET condicional (ETag / Last-Modified)
+    def list(self, request, *args, **kwargs):
+        version = catalog.get_version()
+        etag = catalog.etag(version, request)
+        last_modified = version['last_modified']
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is None:
+            data = catalog.get_response_data(version, request)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                catalog.set_response_data(version, request, data)
+            response = Response(data)
+
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', str, required=True, description='Termos da busca; cada termo também casa como prefixo.'),
+            OpenApiParameter('limit', int, description=f'Máximo de resultados (padrão: {search.DEFAULT_LIMIT}, máximo: {search.MAX_LIMIT}).'),
+        ],
+        responses=serializers.ProductSerializer(many=True),
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def search(self, request):
+        query = request.query_params.get('q', '')
+        if not search.terms(query):
+            raise ValidationError({'q': "Informe o que buscar."})
+        try:
+            limit = min(max(int(request.query_params.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': "Informe um número inteiro."})
+
+        serializer = self.get_serializer(search.search_products(query, limit), many=True)
+        return Response(serializer.data)
 
     def create(self, request, *args, **kwargs):
         # verifica se já existe um produto com o mesmo nome
@@ -139,64 +269,350 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = models.Order.objects.all()
+class OrderViewSet(FlatReadMixin, viewsets.ModelViewSet):
+    # cliente e transportador são serializados como chave primária (lida da própria coluna),
+    # então apenas os itens precisam ser pré-carregados, em uma consulta para todos os pedidos
+    queryset = models.Order.objects.prefetch_related('items')
     serializer_class = serializers.OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderKeysetPagination
+    query_budgets = {
+        'list': 4, 'retrieve': 4, 'create': 10, 'update': 13, 'partial_update': 13, 'destroy': 9,
+        'bulk': 8, 'export': 3, 'route': 3,
+    }
 
     def perform_create(self, serializer):
         # obtém o cliente associado ao usuário autenticado
-        client = self.request.user.client
+        role = resolve_role(self.request.user)
+        if role.client_id is None:
+            raise ValidationError("Apenas clientes podem criar pedidos.")
 
-        # obtém o transportador, fazendo um sorteio se não for fornecido na requisição
+        # obtém o transportador, escolhendo o menos ocupado se não for fornecido na requisição
         transporter_id = self.request.data.get('transporter')
+        reserved = None
         if transporter_id:
-            transporter = get_object_or_404(models.Transporter, id=transporter_id)
+            transporter_id = get_object_or_404(models.Transporter, id=transporter_id).id
         else:
-            # se não houver ID de transportador fornecido, é feito o sorteio de um
-            transporters = models.Transporter.objects.all()
-            transporter = choice(transporters)
-
-        serializer.save(client=client, transporter=transporter, status="Seu pedido saiu para entrega e está a caminho do seu endereço")
-
-    def get_queryset(self):
-        # verifica se o usuário autenticado é um cliente
-        if hasattr(self.request.user, 'client'):
-            # se for cliente, retorna os pedidos associados a ele
+            # a categoria de CNH exigida pode ser informada opcionalmente
+            try:
+                transporter_id = reserved = dispatcher.pick(self.request.data.get('category_cnh'))
+            except ValueError:
+                raise ValidationError({'category_cnh': "Categoria de CNH inválida."})
+            if transporter_id is None:
+                raise ValidationError("Nenhum transportador disponível.")
+
+        try:
+            # OrderSerializer.create é atômico
+            serializer.save(client_id=role.client_id, transporter_id=transporter_id, status=models.Order.Status.OUT_FOR_DELIVERY)
+        except Exception:
+            if reserved is not None:
+                dispatcher.release(reserved)
+            raise
+        if reserved is not None:
+            # na confirmação o post_save soma o pedido à carga; a reserva do pick() é devolvida junto
+            transaction.on_commit(partial(dispatcher.release, reserved))
+
+    # cria vários pedidos de uma vez, com uma consulta por tabela para validar e inserir
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        role = resolve_role(request.user)
+        if role.client_id is None:
+            raise ValidationError("Apenas clientes podem criar pedidos.")
+
+        items = request.data.get('orders') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'orders': "Envie uma lista de pedidos."})
+        max_items = getattr(settings, 'ORDER_BULK_MAX_ITEMS', 5000)
+        if len(items) > max_items:
+            raise ValidationError({'orders': f"Envie no máximo {max_items} pedidos por requisição."})
+
+        # valida os campos de cada item, guardando os erros pela posição na lista
+        errors = {}
+        valid = []
+        item_serializer = serializers.OrderBulkItemSerializer()
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, item_serializer.run_validation(item)))
+            except ValidationError as exc:
+                errors[index] = exc.detail
+
+        # busca os preços de todos os produtos e confere os transportadores com uma consulta cada
+        prices = load_prices(product_id for _, data in valid for product_id in data['lines'])
+        transporter_ids = {data['transporter'] for _, data in valid if data.get('transporter')}
+        existing_transporters = set(models.Transporter.objects.filter(id__in=transporter_ids).values_list('id', flat=True))
+
+        checked = []
+        for index, data in valid:
+            data['total_amount'], missing = price_lines(data['lines'], prices)
+            if missing:
+                errors[index] = {'items': [f"Produto {product_id} não encontrado." for product_id in missing]}
+            elif data.get('transporter') and data['transporter'] not in existing_transporters:
+                errors[index] = {'transporter': [f"Transportador {data['transporter']} não encontrado."]}
+            else:
+                checked.append((index, data))
+
+        # escolhe os transportadores dos itens que não informaram um
+        pending = [(index, data) for index, data in checked if not data.get('transporter')]
+        for (index, data), transporter_id in zip(pending, dispatcher.reserve([data.get('category_cnh') for _, data in pending])):
+            data['transporter'] = transporter_id
+        for index, data in pending:
+            if data['transporter'] is None:
+                errors[index] = {'non_field_errors': ["Nenhum transportador disponível."]}
+        checked = [(index, data) for index, data in checked if index not in errors]
+
+        # grava pedidos e produtos em uma única transação
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                orders = models.Order.objects.bulk_create(
+                    [
+                        models.Order(
+                            client_id=role.client_id,
+                            transporter_id=data['transporter'],
+                            total_amount=data['total_amount'],
+                            status=models.Order.Status.OUT_FOR_DELIVERY,
+                            status_changed_at=now,
+                        )
+                        for _, data in checked
+                    ],
+                    batch_size=500,
+                )
+                models.OrderItem.objects.bulk_create(
+                    [
+                        item
+                        for order, (_, data) in zip(orders, checked)
+                        for item in build_items(order.id, data['lines'], prices)
+                    ],
+                    batch_size=1000,
+                )
+                # bulk_create não dispara post_save: registra os eventos aqui
+                events.record_events(orders)
+        except Exception:
+            # as cargas reservadas não foram gravadas
+            dispatcher.invalidate()
+            raise
+
+        # itens com transportador informado não passaram pela reserva
+        reserved = {index for index, _ in pending}
+        for index, data in checked:
+            if index not in reserved:
+                transaction.on_commit(partial(dispatcher.adjust, data['transporter'], 1))
+
+        created = [order.id for order in orders]
+        errors = [{'index': index, 'errors': detail} for index, detail in sorted(errors.items())]
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
+    # exporta os pedidos em CSV ou NDJSON, em streaming e com memória constante
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('output', str, enum=list(exports.FORMATS), description='Formato do arquivo (padrão: csv).'),
+            OpenApiParameter('start', str, description='Primeira data de entrega (AAAA-MM-DD).'),
+            OpenApiParameter('end', str, description='Última data de entrega (AAAA-MM-DD).'),
+            OpenApiParameter('status', str, description='Status (código ou texto); vários separados por vírgula.'),
+        ],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['get'], url_path='export', pagination_class=None)
+    def export(self, request):
+        # "format" é reservado pelo DRF para a escolha do renderer
+        output = request.query_params.get('output', 'csv')
+        if output not in exports.FORMATS:
+            raise ValidationError({'output': f"Use um destes formatos: {', '.join(exports.FORMATS)}."})
+
+        # a equipe administrativa exporta todos os pedidos; os demais, apenas os próprios
+        queryset = models.Order.objects.all() if request.user.is_staff else self.get_queryset()
+        for param, lookup in (('start', 'delivery_date__gte'), ('end', 'delivery_date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: datetime.strptime(value, '%Y-%m-%d').date()})
+                except ValueError:
+                    raise ValidationError({param: "Use o formato AAAA-MM-DD."})
+        statuses = request.query_params.get('status')
+        if statuses:
+            status_field = serializers.OrderStatusField()
             try:
-                client = self.request.user.client
-                return self.queryset.filter(client=client)
-            except models.CustomUser.client.RelatedObjectDoesNotExist:
-                return self.queryset.none()
-        # verifica se o usuário autenticado é um transportador
-        elif hasattr(self.request.user, 'transporter'):
-            # se for transportador, retorna os pedidos atribuídos a ele
+                queryset = queryset.filter(status__in=[status_field.run_validation(value) for value in statuses.split(',')])
+            except ValidationError:
+                raise ValidationError({'status': "Status inválido."})
+
+        content_type, stream = exports.FORMATS[output]
+        response = streaming_response(
+            request, stream(exports.iter_order_rows(queryset)), batch=exports.DEFAULT_CHUNK_SIZE, content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="pedidos-{timezone.localdate():%Y%m%d}.{output}"'
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+    # rota do dia com os pedidos em aberto do transportador, agrupados por setor de CEP e bairro
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('transporter', int, description='Transportador (apenas para a equipe administrativa).'),
+        ],
+        responses={200: dict},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def route(self, request):
+        if request.user.is_staff and 'transporter' in request.query_params:
             try:
-                transporter = self.request.user.transporter
-                return self.queryset.filter(transporter=transporter)
-            except models.CustomUser.transporter.RelatedObjectDoesNotExist:
-                return self.queryset.none()
+                transporter_id = int(request.query_params['transporter'])
+            except ValueError:
+                raise ValidationError({'transporter': "Informe o id do transportador."})
+        else:
+            transporter_id = resolve_role(request.user).transporter_id
+            if transporter_id is None:
+                raise PermissionDenied("Apenas transportadores têm rota de entrega.")
+        return Response(routing.route_for(transporter_id))
+
+    def get_queryset(self):
+        # resolve o papel do usuário autenticado com uma única consulta
+        role = resolve_role(self.request.user)
+
+        # se for cliente, retorna os pedidos associados a ele
+        if role.client_id is not None:
+            return self.queryset.filter(client_id=role.client_id)
+        # se for transportador, retorna os pedidos atribuídos a ele
+        elif role.transporter_id is not None:
+            return self.queryset.filter(transporter_id=role.transporter_id)
         else:
             # se o usuário autenticado não for nem cliente nem transportador, retorna uma lista vazia
-            print("Não é cliente nem transportador")
             return self.queryset.none()
         
     
 class TransporterStatisticsViewSet(viewsets.ViewSet):
+    query_budgets = {'list': 3}
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('start', str, description='Primeiro mês do período (AAAA-MM).'),
+            OpenApiParameter('end', str, description='Último mês do período (AAAA-MM).'),
+        ],
+        responses=serializers.TransporterStatisticsSerializer,
+    )
     def list(self, request):
-        # filtra os pedidos atribuídos a este transportador
-        transporter = request.user.transporter
-        orders = models.Order.objects.filter(transporter=transporter)
-
-        # calcula o total de entregas realizadas neste mês
-        total_deliveries = orders.filter(status="Pedido entregue").count()
-
-        # calcula o total do valor das entregas
-        total_value = orders.filter(status="Pedido entregue").aggregate(total_value=Sum('total_amount'))
+        # apenas transportadores possuem estatísticas de entrega
+        role = resolve_role(request.user)
+        if role.transporter_id is None:
+            raise PermissionDenied("Apenas transportadores possuem estatísticas de entrega.")
+
+        # lê os totais mensais já calculados, opcionalmente limitados a um período
+        months = models.TransporterMonthlyStatistics.objects.filter(transporter_id=role.transporter_id, deliveries__gt=0)
+        for param, lookup in (('start', 'month__gte'), ('end', 'month__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    months = months.filter(**{lookup: datetime.strptime(value, '%Y-%m').date()})
+                except ValueError:
+                    raise ValidationError({param: "Use o formato AAAA-MM."})
+        months = list(months.order_by('month').values('month', 'deliveries', 'total_value'))
 
         # retorna os resultados
         data = {
-            'total_deliveries': total_deliveries,
-            'total_value': total_value['total_value']
+            'total_deliveries': sum(month['deliveries'] for month in months),
+            'total_value': sum(month['total_value'] for month in months) if months else None,
+            'deliveries_per_month': months,
         }
-        return Response(data)
+        return Response(serializers.TransporterStatisticsSerializer(data).data)
+
+
+# estatísticas de desempenho por rota, a partir das amostras deste processo
+class PerformanceViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+    query_budgets = {'list': 1, 'reset': 1}
+
+    def list(self, request):
+        rows = performance.samples.snapshot()
+        return Response({
+            'pid': os.getpid(),
+            'samples': len(rows),
+            'oldest': datetime.fromtimestamp(rows[0]['time'], tz=dt_timezone.utc) if rows else None,
+            'histogram_bounds_ms': performance.HISTOGRAM_BOUNDS,
+            'routes': performance.route_statistics(rows),
+        })
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        performance.samples.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# feed SSE das mudanças de status dos pedidos do cliente / transportador autenticado (requer ASGI)
+@require_GET
+async def order_events(request):
+    user, role = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': "As credenciais de autenticação não foram fornecidas."}, status=401)
+    keys = events.role_keys(role)
+    if not keys:
+        return JsonResponse({'detail': "Apenas clientes e transportadores recebem eventos de pedidos."}, status=403)
+
+    # o navegador reenvia o último id recebido ao reconectar
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return JsonResponse({'last_event_id': "Informe um número inteiro."}, status=400)
+
+    # assina antes de ler o histórico para não perder eventos publicados entre as duas coisas
+    subscription = events.broker.subscribe(keys)
+    if last_id is None:
+        last_id = await sync_to_async(events.last_event_id)()
+
+    response = StreamingHttpResponse(_event_stream(subscription, keys, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # desliga o buffer do nginx para os eventos saírem na hora
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _authenticate(request):
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None, None
+    if not user or not user.is_authenticated:
+        return None, None
+    return user, resolve_role(user)
+
+
+async def _event_stream(subscription, keys, last_id):
+    heartbeat = getattr(settings, 'ORDER_EVENTS_HEARTBEAT_SECONDS', 15)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def format_event(event):
+        return f"id: {event['id']}\nevent: order-status\ndata: {encoder.encode(event)}\n\n"
+
+    try:
+        yield f'retry: {heartbeat * 1000}\n\n'
+        pending = True
+        while True:
+            # relê o histórico: retomada após reconexão, eventos de outros processos e fila estourada
+            while pending:
+                backlog = await sync_to_async(events.load_events)(keys, last_id)
+                for event in backlog:
+                    yield format_event(event)
+                    last_id = event['id']
+                pending = len(backlog) == events.BACKLOG_LIMIT
+
+            try:
+                event = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                pending = True
+                yield ': keepalive\n\n'
+                continue
+
+            if subscription.overflowed:
+                subscription.overflowed = False
+                pending = True
+            elif event['id'] > last_id:
+                yield format_event(event)
+                last_id = event['id']
+    finally:
+        subscription.close()